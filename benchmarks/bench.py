@@ -0,0 +1,210 @@
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import typer
+from typing_extensions import Annotated, Callable, Dict, List, Optional
+from dextree.dex_ints import decode_method, parse_instructions, scan_const_strings
+from dextree.pools import DexPools
+from dextree.render import TreeRenderer
+from dextree.sources import Backend, parse_dex
+from dextree.treeformat import set_colors
+from dextree.treemaker import treeify
+from synthdex import Mix, generate
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DIR = os.path.join(HERE, '.results')
+
+
+def code_methods(dex) -> list:
+    return [m for c in dex.classes for m in c.methods if m.code_offset]
+
+
+def stage_parse(file: str, backend: Backend) -> Callable[[], object]:
+    return lambda: parse_dex(file, backend)
+
+
+def stage_scan(file: str, backend: Backend) -> Callable[[], object]:
+    # lief members are only valid while their dex is alive
+    dex = parse_dex(file, backend)
+    pools = DexPools(dex)
+    buffers = [pools.code(m) for m in code_methods(dex)]
+    return lambda: [scan_const_strings(buffer) for buffer in buffers]
+
+
+def stage_decode(file: str, backend: Backend) -> Callable[[], object]:
+    dex = parse_dex(file, backend)
+    pools = DexPools(dex)
+    methods = code_methods(dex)
+    return lambda: [decode_method(method, pools) for method in methods]
+
+
+def stage_instructions(file: str, backend: Backend) -> Callable[[], object]:
+    dex = parse_dex(file, backend)
+    pools = DexPools(dex)
+    methods = code_methods(dex)
+    return lambda: [parse_instructions(method, pools) for method in methods]
+
+
+def stage_treeify(file: str, backend: Backend) -> Callable[[], object]:
+    dex = parse_dex(file, backend)
+    return lambda: treeify(dex, code=True)
+
+
+def stage_render(file: str, backend: Backend) -> Callable[[], object]:
+    root = treeify(parse_dex(file, backend), code=True)
+
+    def render():
+        with io.StringIO() as out:
+            root.iterate(TreeRenderer(out))
+
+    return render
+
+
+STAGES = {
+    'parse': stage_parse,
+    'scan': stage_scan,
+    'decode': stage_decode,
+    'instructions': stage_instructions,
+    'treeify': stage_treeify,
+    'render': stage_render,
+}
+
+
+def measure(setup: Callable[[], Callable[[], object]], repeat: int) -> List[float]:
+    # a fresh setup per round, so warm pool caches don't carry over
+    times = []
+    for _ in range(repeat):
+        run = setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def revision() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def load_history(path: str, config: Dict) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        runs = [json.loads(line) for line in f if line.strip()]
+    return [run for run in runs if run['config'] == config]
+
+
+def main(
+    classes: Annotated[int, typer.Option(min=1)] = 200,
+    methods: Annotated[int, typer.Option(min=1, help='methods per class')] = 10,
+    instructions: Annotated[
+        int, typer.Option(min=1, help='instructions per method')
+    ] = 50,
+    strings: Annotated[int, typer.Option(min=1, help='distinct const-strings')] = 2000,
+    mix: Annotated[Mix, typer.Option(help='opcode mix')] = Mix.typical,
+    seed: Annotated[int, typer.Option()] = 0,
+    backend: Annotated[Backend, typer.Option(help='dex reader')] = Backend.native,
+    stages: Annotated[
+        Optional[List[str]],
+        typer.Option('--stage', help='stages to run, all by default'),
+    ] = None,
+    repeat: Annotated[int, typer.Option(min=1, help='rounds per stage')] = 5,
+    results: Annotated[
+        str, typer.Option(help='directory for dex files and history')
+    ] = DEFAULT_DIR,
+    window: Annotated[
+        int, typer.Option(min=1, help='earlier runs to compare against')
+    ] = 5,
+    threshold: Annotated[
+        float, typer.Option(help='allowed slowdown, 0.1 is 10%')
+    ] = 0.1,
+    save: Annotated[bool, typer.Option(help='append this run to the history')] = True,
+):
+    stages = stages or []
+    for stage in stages:
+        if stage not in STAGES:
+            raise typer.BadParameter(
+                f'unknown stage {stage}, one of {", ".join(STAGES)}'
+            )
+    set_colors(False)
+
+    # the same parameters always generate the same file
+    params = dict(
+        classes=classes,
+        methods=methods,
+        instructions=instructions,
+        strings=strings,
+        mix=mix.value,
+        seed=seed,
+    )
+    name = 'synth-{classes}-{methods}-{instructions}-{strings}-{mix}-{seed}.dex'.format(
+        **params
+    )
+    file = os.path.join(results, name)
+    os.makedirs(results, exist_ok=True)
+    if not os.path.exists(file):
+        with open(file, 'wb') as f:
+            f.write(generate(classes, methods, instructions, strings, mix, seed))
+
+    config = dict(params, backend=backend.value, python=platform.python_version())
+    history_path = os.path.join(results, 'history.jsonl')
+    history = load_history(history_path, config)[-window:]
+
+    regressions = []
+    timings = {}
+    print(f'{name} ({os.path.getsize(file)} bytes, {backend.value}, {repeat} rounds)')
+    print(f'{"stage":<14}{"median":>12}{"min":>12}{"baseline":>12}{"change":>10}')
+    for stage in stages or STAGES:
+        times = measure(lambda: STAGES[stage](file, backend), repeat)
+        median = statistics.median(times)
+        timings[stage] = {'median': median, 'min': min(times)}
+
+        # compared to the median of the same stage over recent runs
+        previous = [
+            run['timings'][stage]['median']
+            for run in history
+            if stage in run['timings']
+        ]
+        baseline = statistics.median(previous) if previous else None
+        line = f'{stage:<14}{median * 1000:>10.2f}ms{min(times) * 1000:>10.2f}ms'
+        if baseline:
+            change = median / baseline - 1
+            line += f'{baseline * 1000:>10.2f}ms{change:>+10.1%}'
+            if change > threshold:
+                regressions.append(stage)
+                line += '  REGRESSION'
+        print(line)
+
+    if save:
+        run = {
+            'time': time.time(),
+            'revision': revision(),
+            'config': config,
+            'timings': timings,
+        }
+        with open(history_path, 'a') as f:
+            f.write(json.dumps(run) + '\n')
+
+    if regressions:
+        print(
+            f'slower than {threshold:.0%} over baseline: {", ".join(regressions)}',
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+
+
+if __name__ == '__main__':
+    typer.run(main)
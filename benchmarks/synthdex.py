@@ -0,0 +1,465 @@
+import hashlib
+import random
+import struct
+import zlib
+import typer
+from collections import defaultdict
+from enum import Enum
+from typing_extensions import Annotated, Callable, Dict, List, Tuple
+from dextree.dex_ints import INSTRUCTIONS, Template
+
+HEADER_SIZE = 0x70
+OBJECT = 'Ljava/lang/Object;'
+STRING = 'Ljava/lang/String;'
+
+# pools the first operand unit indexes into, by opcode
+STRING_OPS = {0x1A, 0x1B, 0x24}
+TYPE_OPS = {0x1C, 0x1F, 0x20, 0x22, 0x23, 0x25}
+FIELD_OPS = set(range(0x52, 0x6E))
+METHOD_OPS = set(range(0x6E, 0x79))
+
+
+def uleb128(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def encode_mutf8(text: str) -> bytes:
+    data = text.encode('utf-16-le', 'surrogatepass')
+    out = bytearray()
+    for unit in struct.unpack('<%dH' % (len(data) // 2), data):
+        if unit == 0:
+            out += b'\xc0\x80'
+        elif unit < 0x80:
+            out.append(unit)
+        elif unit < 0x800:
+            out += bytes([0xC0 | (unit >> 6), 0x80 | (unit & 0x3F)])
+        else:
+            out += bytes(
+                [0xE0 | (unit >> 12), 0x80 | ((unit >> 6) & 0x3F), 0x80 | (unit & 0x3F)]
+            )
+    return bytes(out)
+
+
+def shorty(descriptor: str) -> str:
+    return 'L' if descriptor[0] in 'L[' else descriptor
+
+
+Pools = Dict[str, Dict]
+Code = Callable[[Pools], List[int]]
+
+
+class DexBuilder(object):
+    def __init__(self):
+        self.strings = set()
+        self.types = set()
+        self.protos = set()
+        self.fields = set()
+        self.methods = set()
+        self.classes = []
+
+    def string(self, text: str) -> str:
+        self.strings.add(text)
+        return text
+
+    def type(self, descriptor: str) -> str:
+        self.types.add(descriptor)
+        self.strings.add(descriptor)
+        return descriptor
+
+    def proto(self, returns: str, parameters: Tuple[str, ...]) -> tuple:
+        key = (shorty(returns) + ''.join(map(shorty, parameters)), returns, parameters)
+        self.string(key[0])
+        for descriptor in (returns, *parameters):
+            self.type(descriptor)
+        self.protos.add(key)
+        return key
+
+    def field(self, cls: str, type: str, name: str) -> tuple:
+        self.type(cls)
+        self.type(type)
+        self.string(name)
+        key = (cls, name, type)
+        self.fields.add(key)
+        return key
+
+    def method(
+        self, cls: str, name: str, returns: str, parameters: Tuple[str, ...]
+    ) -> tuple:
+        self.type(cls)
+        self.string(name)
+        key = (cls, name, self.proto(returns, tuple(parameters)))
+        self.methods.add(key)
+        return key
+
+    def add_class(
+        self,
+        descriptor: str,
+        static_fields=(),
+        instance_fields=(),
+        direct_methods=(),
+        virtual_methods=(),
+    ):
+        # fields are (field, flags), methods are (method, flags, code or None)
+        self.type(descriptor)
+        self.type(OBJECT)
+        self.classes.append(
+            (
+                descriptor,
+                list(static_fields),
+                list(instance_fields),
+                list(direct_methods),
+                list(virtual_methods),
+            )
+        )
+
+    def build(self) -> bytes:
+        strings = sorted(self.strings, key=encode_mutf8)
+        string_ids = {s: i for i, s in enumerate(strings)}
+        types = sorted(self.types, key=string_ids.__getitem__)
+        type_ids = {t: i for i, t in enumerate(types)}
+        protos = sorted(
+            self.protos, key=lambda p: (type_ids[p[1]], [type_ids[t] for t in p[2]])
+        )
+        proto_ids = {p: i for i, p in enumerate(protos)}
+        fields = sorted(
+            self.fields,
+            key=lambda f: (type_ids[f[0]], string_ids[f[1]], type_ids[f[2]]),
+        )
+        field_ids = {f: i for i, f in enumerate(fields)}
+        methods = sorted(
+            self.methods,
+            key=lambda m: (type_ids[m[0]], string_ids[m[1]], proto_ids[m[2]]),
+        )
+        method_ids = {m: i for i, m in enumerate(methods)}
+        pools = {
+            'string': string_ids,
+            'type': type_ids,
+            'field': field_ids,
+            'method': method_ids,
+        }
+
+        string_ids_off = HEADER_SIZE
+        type_ids_off = string_ids_off + 4 * len(strings)
+        proto_ids_off = type_ids_off + 4 * len(types)
+        field_ids_off = proto_ids_off + 12 * len(protos)
+        method_ids_off = field_ids_off + 8 * len(fields)
+        class_defs_off = method_ids_off + 8 * len(methods)
+        data_off = class_defs_off + 32 * len(self.classes)
+        data = bytearray()
+        map_items = []
+
+        def here() -> int:
+            return data_off + len(data)
+
+        def align():
+            data.extend(bytes(-here() % 4))
+
+        # code items
+        align()
+        code_offs = {}
+        section = here()
+        for index, (_, _, _, direct, virtual) in enumerate(self.classes):
+            for method, _, code in direct + virtual:
+                if code is None:
+                    continue
+                align()
+                insns = code(pools)
+                code_offs[index, method] = here()
+                data.extend(struct.pack('<4H2I', 16, 0, 16, 0, 0, len(insns)))
+                data.extend(struct.pack('<%dH' % len(insns), *insns))
+        if code_offs:
+            map_items.append((0x2001, len(code_offs), section))
+
+        # parameter type lists
+        align()
+        type_lists = {}
+        section = here()
+        for _, _, parameters in protos:
+            if parameters and parameters not in type_lists:
+                align()
+                type_lists[parameters] = here()
+                data.extend(
+                    struct.pack(
+                        '<I%dH' % len(parameters),
+                        len(parameters),
+                        *map(type_ids.__getitem__, parameters),
+                    )
+                )
+        if type_lists:
+            map_items.append((0x1001, len(type_lists), section))
+
+        # string data
+        string_offs = []
+        section = here()
+        for text in strings:
+            string_offs.append(here())
+            data.extend(
+                uleb128(len(text.encode('utf-16-le')) // 2) + encode_mutf8(text) + b'\0'
+            )
+        map_items.append((0x2002, len(strings), section))
+
+        # class data
+        class_data_offs = []
+        section = here()
+        for index, (_, static, instance, direct, virtual) in enumerate(self.classes):
+            if not (static or instance or direct or virtual):
+                class_data_offs.append(0)
+                continue
+            class_data_offs.append(here())
+            data.extend(
+                b''.join(
+                    uleb128(len(items)) for items in (static, instance, direct, virtual)
+                )
+            )
+            for items in (static, instance):
+                last = 0
+                for field, flags in sorted(items, key=lambda item: field_ids[item[0]]):
+                    data.extend(uleb128(field_ids[field] - last) + uleb128(flags))
+                    last = field_ids[field]
+            for items in (direct, virtual):
+                last = 0
+                for method, flags, _ in sorted(
+                    items, key=lambda item: method_ids[item[0]]
+                ):
+                    code_off = code_offs.get((index, method), 0)
+                    data.extend(
+                        uleb128(method_ids[method] - last)
+                        + uleb128(flags)
+                        + uleb128(code_off)
+                    )
+                    last = method_ids[method]
+        if any(class_data_offs):
+            map_items.append((0x2000, sum(map(bool, class_data_offs)), section))
+
+        # map list
+        align()
+        map_off = here()
+        items = [(0x0000, 1, 0)]
+        for kind, count, offset in (
+            (0x0001, len(strings), string_ids_off),
+            (0x0002, len(types), type_ids_off),
+            (0x0003, len(protos), proto_ids_off),
+            (0x0004, len(fields), field_ids_off),
+            (0x0005, len(methods), method_ids_off),
+            (0x0006, len(self.classes), class_defs_off),
+        ):
+            if count:
+                items.append((kind, count, offset))
+        items += map_items + [(0x1000, 1, map_off)]
+        data.extend(struct.pack('<I', len(items)))
+        for kind, count, offset in items:
+            data.extend(struct.pack('<2H2I', kind, 0, count, offset))
+
+        out = bytearray(HEADER_SIZE)
+        out += struct.pack('<%dI' % len(strings), *string_offs)
+        out += struct.pack('<%dI' % len(types), *(string_ids[t] for t in types))
+        for name, returns, parameters in protos:
+            out += struct.pack(
+                '<3I',
+                string_ids[name],
+                type_ids[returns],
+                type_lists.get(parameters, 0),
+            )
+        for cls, name, type in fields:
+            out += struct.pack('<2HI', type_ids[cls], type_ids[type], string_ids[name])
+        for cls, name, proto in methods:
+            out += struct.pack(
+                '<2HI', type_ids[cls], proto_ids[proto], string_ids[name]
+            )
+        for index, (descriptor, *_) in enumerate(self.classes):
+            out += struct.pack(
+                '<8I',
+                type_ids[descriptor],
+                1,
+                type_ids[OBJECT],
+                0,
+                0xFFFFFFFF,
+                0,
+                class_data_offs[index],
+                0,
+            )
+        out += data
+
+        struct.pack_into('<8s', out, 0, b'dex\n035\0')
+        struct.pack_into(
+            '<7I',
+            out,
+            32,
+            len(out),
+            HEADER_SIZE,
+            0x12345678,
+            0,
+            0,
+            map_off,
+            len(strings),
+        )
+        struct.pack_into(
+            '<13I', out, 60,
+            string_ids_off if strings else 0,
+            len(types), type_ids_off if types else 0,
+            len(protos), proto_ids_off if protos else 0,
+            len(fields), field_ids_off if fields else 0,
+            len(methods), method_ids_off if methods else 0,
+            len(self.classes), class_defs_off if self.classes else 0,
+            len(out) - data_off, data_off,
+        )  # fmt: skip
+        out[12:32] = hashlib.sha1(out[32:]).digest()
+        struct.pack_into('<I', out, 8, zlib.adler32(out[12:]))
+        return bytes(out)
+
+
+class Mix(str, Enum):
+    uniform = 'uniform'
+    typical = 'typical'
+    strings = 'strings'
+
+
+# relative template weights, anything not listed counts 1
+MIX_WEIGHTS = {
+    Mix.uniform: {},
+    Mix.typical: {
+        Template.FMT35C: 20,
+        Template.FMT21C: 15,
+        Template.FMT22C: 12,
+        Template.FMT12X: 10,
+        Template.FMT11X: 10,
+        Template.FMT10X: 8,
+        Template.FMT11N: 6,
+        Template.FMT21T: 5,
+        Template.FMT22T: 4,
+        Template.FMT23X: 4,
+    },
+    Mix.strings: {
+        Template.FMT21C: 40,
+        Template.FMT31C: 10,
+        Template.FMT35C: 10,
+    },
+}
+
+PAYLOADS = {
+    0x2B: lambda rng: [0x0100, 2, 0, 0, 3, 0, 5, 0],
+    0x2C: lambda rng: [0x0200, 2, 1, 0, 7, 0, 3, 0, 5, 0],
+    0x26: lambda rng: [0x0300, 4, 3, 0, 0x0201, 0x0403, 0x0605, 0x0807, 0x0A09, 0x0C0B],
+}
+
+
+def opcodes_by_template() -> Dict[Template, List[int]]:
+    opcodes = defaultdict(list)
+    for op, inst in INSTRUCTIONS.items():
+        opcodes[inst.template].append(op)
+    return opcodes
+
+
+def pool_index(op: int, rng: random.Random, pools: Pools, keys: Dict[str, list]) -> int:
+    for kind, ops in (
+        ('string', STRING_OPS),
+        ('type', TYPE_OPS),
+        ('field', FIELD_OPS),
+        ('method', METHOD_OPS),
+    ):
+        if op in ops:
+            return pools[kind][rng.choice(keys[kind])]
+    return rng.randrange(len(keys['string']))
+
+
+def encode(
+    op: int, template: Template, rng: random.Random, pools: Pools, keys: Dict[str, list]
+) -> List[int]:
+    # plain nops only, a nop with a high byte set reads as a payload
+    high = 0 if op == 0 else rng.randrange(256)
+    if template == Template.FMT35C:
+        high = rng.randrange(6) << 4 | rng.randrange(16)
+    units = [op | high << 8]
+    units += [rng.randrange(0x10000) for _ in range(template.size - 1)]
+    if template in (Template.FMT21C, Template.FMT22C, Template.FMT35C, Template.FMT3RC):
+        units[1] = pool_index(op, rng, pools, keys)
+    elif template == Template.FMT31C:
+        index = pool_index(op, rng, pools, keys)
+        units[1:3] = [index & 0xFFFF, index >> 16]
+    return units
+
+
+def generate(
+    classes: int = 100,
+    methods: int = 10,
+    instructions: int = 50,
+    strings: int = 1000,
+    mix: Mix = Mix.typical,
+    seed: int = 0,
+) -> bytes:
+    rng = random.Random(seed)
+    builder = DexBuilder()
+    opcodes = opcodes_by_template()
+    weights = MIX_WEIGHTS[mix]
+    templates = list(opcodes)
+    template_weights = [weights.get(template, 1) for template in templates]
+
+    keys = {
+        'string': [
+            builder.string('str_%d_%s' % (i, 'x' * (i % 11))) for i in range(strings)
+        ],
+        'type': [builder.type(OBJECT), builder.type(STRING)],
+        'field': [],
+        'method': [builder.method(OBJECT, 'toString', STRING, ())],
+    }
+
+    def code(count: int, rng: random.Random) -> Code:
+        def emit(pools: Pools) -> List[int]:
+            insns = []
+            payloads = []
+            for template in rng.choices(templates, template_weights, k=count):
+                op = rng.choice(opcodes[template])
+                insns += encode(op, template, rng, pools, keys)
+                if op in PAYLOADS:
+                    payloads.append(PAYLOADS[op](rng))
+            insns.append(0x000E)
+            for payload in payloads:
+                insns += [0] * (len(insns) % 2) + payload
+            return insns
+
+        return emit
+
+    for index in range(classes):
+        cls = 'Lcom/bench/p%d/s%d/C%d;' % (index % 17, index % 5, index)
+        keys['type'].append(builder.type(cls))
+        static = [(builder.field(cls, 'I', 'COUNT'), 0x19)]
+        instance = [(builder.field(cls, STRING, 'name'), 0x2)]
+        keys['field'] += [static[0][0], instance[0][0]]
+
+        direct = []
+        for number in range(methods):
+            method = builder.method(cls, 'm%d' % number, 'V', ('I', STRING))
+            keys['method'].append(method)
+            direct.append(
+                (method, 0x9, code(instructions, random.Random(rng.random())))
+            )
+        builder.add_class(cls, static, instance, direct)
+    return builder.build()
+
+
+def main(
+    output: Annotated[str, typer.Argument(help='dex file to write')],
+    classes: Annotated[int, typer.Option(min=1)] = 100,
+    methods: Annotated[int, typer.Option(min=0, help='methods per class')] = 10,
+    instructions: Annotated[
+        int, typer.Option(min=0, help='instructions per method')
+    ] = 50,
+    strings: Annotated[int, typer.Option(min=1, help='distinct const-strings')] = 1000,
+    mix: Annotated[Mix, typer.Option(help='opcode mix')] = Mix.typical,
+    seed: Annotated[int, typer.Option()] = 0,
+):
+    data = generate(classes, methods, instructions, strings, mix, seed)
+    with open(output, 'wb') as f:
+        f.write(data)
+
+
+if __name__ == '__main__':
+    typer.run(main)
@@ -0,0 +1,155 @@
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+import zlib
+from typing_extensions import List, Optional, Tuple
+from dextree import classcache
+from dextree.treemaker import (
+    RootPackage,
+    TreeClass,
+    TreeField,
+    TreeMethod,
+    TreePackage,
+    TreeString,
+)
+
+FORMAT_VERSION = 2
+SUFFIX = '.tree'
+
+
+def encode_string(item: Optional[TreeString]):
+    return item.value if item is not None else None
+
+
+def encode_class(item: TreeClass) -> tuple:
+    fields = [
+        (f.name, f.type, f.is_static, encode_string(f.string_value))
+        for f in item.fields
+    ]
+    methods = [
+        (
+            m.name,
+            m.parameter_types,
+            m.return_type,
+            m.access_mask,
+            [s.value for s in m.string_values],
+        )
+        for m in item.methods
+    ]
+    return (item.path, item.name, fields, methods)
+
+
+def encode_package(item: TreePackage) -> tuple:
+    packages = [encode_package(p) for p in item.packages.values()]
+    classes = [encode_class(c) for c in item.classes.values()]
+    return (item.path, item.name, packages, classes)
+
+
+def decode_class(data: tuple, root: RootPackage) -> TreeClass:
+    item = TreeClass.new(*data[:2])
+    for name, type, is_static, value in data[2]:
+        field = TreeField.new(name, sys.intern(type), is_static)
+        field.string_value = TreeString(value) if value is not None else None
+        item.fields.append(field)
+    for name, params, ret, mask, values in data[3]:
+        params = root.intern_types(tuple(map(sys.intern, params)))
+        method = TreeMethod.new(name, params, sys.intern(ret), mask)
+        method.string_values.extend(map(TreeString, values))
+        item.methods.append(method)
+    return item
+
+
+def decode_package(data: tuple, item: TreePackage, root: RootPackage) -> TreePackage:
+    _, _, packages, classes = data
+    for package in packages:
+        path, name = package[:2]
+        child = root.package(f'{path}/{name}' if path else name)
+        decode_package(package, child, root)
+    for clazz in classes:
+        item.classes[clazz[1]] = decode_class(clazz, root)
+    return item
+
+
+def dump_tree(root: RootPackage) -> bytes:
+    return zlib.compress(marshal.dumps(encode_package(root)))
+
+
+def load_tree(data: bytes) -> RootPackage:
+    root = RootPackage()
+    return decode_package(marshal.loads(zlib.decompress(data)), root, root)
+
+
+class TreeCache(object):
+    def __init__(self, directory: str, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+
+    def key(self, signatures: List[bytes], **options) -> str:
+        digest = hashlib.sha1(b'%d' % FORMAT_VERSION)
+        for signature in signatures:
+            digest.update(signature)
+        for name, value in sorted(options.items()):
+            digest.update(f';{name}={value}'.encode())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def load(self, key: str) -> Optional[RootPackage]:
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                root = load_tree(f.read())
+        except (OSError, ValueError, EOFError, zlib.error):
+            return None
+
+        # keep recently used entries from eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return root
+
+    def store(self, key: str, root: RootPackage):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(dump_tree(root))
+        os.replace(temp, self.path(key))
+        self.evict()
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self) -> int:
+        try:
+            return sum(size for _, size, _ in self.entries())
+        except OSError:
+            return 0
+
+    def evict(self):
+        entries = self.entries()
+
+        # the class cache shares the directory and its size limit
+        total = sum(size for _, size, _ in entries)
+        try:
+            total += os.path.getsize(os.path.join(self.directory, classcache.FILE_NAME))
+        except OSError:
+            pass
+
+        # drop least recently used entries until the cache fits
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,118 @@
+import marshal
+import os
+import sqlite3
+import struct
+import time
+from hashlib import blake2b
+from typing_extensions import Dict, List, Optional, Self, Sequence
+
+FORMAT_VERSION = 1
+FILE_NAME = 'classes.db'
+CODE_SIZE = struct.Struct('<I')
+TOUCH_AFTER = 3600
+
+SCHEMA = """
+PRAGMA auto_vacuum = FULL;
+CREATE TABLE IF NOT EXISTS classes (
+    key BLOB PRIMARY KEY,
+    data BLOB NOT NULL,
+    used REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class ClassCache(object):
+    def __init__(self, connection: sqlite3.Connection, max_size: int):
+        self.connection = connection
+        self.max_size = max_size
+        # written in one transaction when closed, not once per class
+        self.added: Dict[bytes, bytes] = {}
+        self.used: List[bytes] = []
+        self.started = time.time()
+
+    @staticmethod
+    def open(directory: str, max_size: int) -> Self:
+        os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(os.path.join(directory, FILE_NAME), timeout=30)
+        connection.executescript(SCHEMA)
+        return ClassCache(connection, max_size)
+
+    def key(self, buffers: Sequence[memoryview]) -> bytes:
+        # the code of every method of the class in order, not where it sits
+        # pool ids are hashed as they are, following them into the pools means
+        # walking the code, which costs more than the const-string scan it saves
+        digest = blake2b(b'%d;' % FORMAT_VERSION, digest_size=16)
+        for buffer in buffers:
+            digest.update(CODE_SIZE.pack(len(buffer)))
+            digest.update(buffer)
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[List[List[int]]]:
+        data = self.added.get(key)
+        if data is None:
+            row = self.connection.execute(
+                'SELECT data, used FROM classes WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            data, used = row
+            # recently used entries are not written again on every hit
+            if used < self.started - TOUCH_AFTER:
+                self.used.append(key)
+        try:
+            return marshal.loads(data)
+        except (ValueError, EOFError, TypeError):
+            return None
+
+    def put(self, key: bytes, ids: List[List[int]]):
+        self.added[key] = marshal.dumps(ids)
+
+    def close(self):
+        db = self.connection
+        now = self.started
+        try:
+            with db:
+                db.executemany(
+                    'INSERT OR REPLACE INTO classes (key, data, used) VALUES (?, ?, ?)',
+                    ((key, data, now) for key, data in self.added.items()),
+                )
+                db.executemany(
+                    'UPDATE classes SET used = ? WHERE key = ?',
+                    ((now, key) for key in self.used),
+                )
+                self.evict()
+        finally:
+            db.close()
+
+    def size(self) -> int:
+        # pages in use, free ones are given back to the file system on commit
+        db = self.connection
+        (pages,) = db.execute('PRAGMA page_count').fetchone()
+        (free,) = db.execute('PRAGMA freelist_count').fetchone()
+        (page_size,) = db.execute('PRAGMA page_size').fetchone()
+        return (pages - free) * page_size
+
+    def evict(self):
+        db = self.connection
+        size = self.size()
+        while size > self.max_size:
+            # rows take more room in the file than their data, the limit is scaled
+            (used,) = db.execute(
+                'SELECT total(length(key) + length(data)) FROM classes'
+            ).fetchone()
+            if not used:
+                return
+            limit = int(used * self.max_size / size)
+
+            # drop least recently used entries until the cache fits
+            db.execute(
+                'DELETE FROM classes WHERE key IN ('
+                'SELECT key FROM ('
+                'SELECT key, sum(length(key) + length(data)) '
+                'OVER (ORDER BY used DESC, key) AS total '
+                'FROM classes'
+                ') WHERE total > ?'
+                ')',
+                (limit,),
+            )
+            size = self.size()
@@ -0,0 +1,409 @@
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from functools import cached_property
+from typing_extensions import Dict, List, Optional, Self, Tuple
+from lief import DEX
+from dextree.pools import PoolTable
+
+DEX_MAGIC = b'dex\n'
+NO_INDEX = 0xFFFFFFFF
+
+PRIMITIVES = {
+    'V': 'void',
+    'Z': 'bool',
+    'B': 'byte',
+    'S': 'short',
+    'C': 'char',
+    'I': 'int',
+    'J': 'long',
+    'F': 'float',
+    'D': 'double',
+}
+
+ACCESS_FLAGS = [
+    DEX.ACCESS_FLAGS(value)
+    for value in dict.fromkeys(f.value for f in DEX.ACCESS_FLAGS.__members__.values())
+    if value
+]
+
+
+# lief names aliased flags once per alias, with one of the two names
+FLAG_NAMES = [
+    {0x40: 'volatile', 0x80: 'varargs'}.get(flag.value, flag.name.lower())
+    for flag in DEX.ACCESS_FLAGS.__members__.values()
+]
+FLAG_VALUES = [flag.value for flag in DEX.ACCESS_FLAGS.__members__.values()]
+
+
+def access_flags(mask: int) -> List[DEX.ACCESS_FLAGS]:
+    return [flag for flag in ACCESS_FLAGS if mask & flag.value]
+
+
+def fmt_access(mask: int) -> str:
+    # the prefix lief puts in front of members, empty without flags
+    return ''.join(
+        f'{name} ' for name, value in zip(FLAG_NAMES, FLAG_VALUES) if mask & value
+    )
+
+
+def flags_mask(item) -> int:
+    mask = getattr(item, 'access_mask', None)
+    if mask is None:
+        mask = 0
+        for flag in item.access_flags:
+            mask |= flag.value
+    return mask
+
+
+def read_uleb128(view: memoryview, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = view[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def decode_mutf8(data: bytes) -> str:
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        text = data.replace(b'\xc0\x80', b'\0').decode('utf-8', 'surrogatepass')
+        return text.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')
+
+
+def type_name(descriptor: str) -> str:
+    element = descriptor.lstrip('[')
+    dim = len(descriptor) - len(element)
+    return PRIMITIVES.get(element, element) + '[]' * dim
+
+
+def class_path(descriptor: str) -> Tuple[str, str]:
+    package, _, name = descriptor[1:-1].rpartition('/')
+    return package, name
+
+
+@dataclass
+class DexHeader(object):
+    magic: bytes
+    checksum: int
+    signature: bytes
+    file_size: int
+    header_size: int
+    endian_tag: int
+    link_size: int
+    link_off: int
+    map_off: int
+    string_ids_size: int
+    string_ids_off: int
+    type_ids_size: int
+    type_ids_off: int
+    proto_ids_size: int
+    proto_ids_off: int
+    field_ids_size: int
+    field_ids_off: int
+    method_ids_size: int
+    method_ids_off: int
+    class_defs_size: int
+    class_defs_off: int
+    data_size: int
+    data_off: int
+
+    FORMAT = struct.Struct('<8sI20s20I')
+
+    @staticmethod
+    def parse(view: memoryview) -> Self:
+        return DexHeader(*DexHeader.FORMAT.unpack_from(view, 0))
+
+
+@dataclass
+class DexPrototype(object):
+    parameters_type: Tuple[str, ...]
+    return_type: str
+
+
+@dataclass
+class DexField(object):
+    dex: 'DexFile'
+    index: int
+    cls: str
+    name: str
+    type: str
+    access_mask: int = 0
+
+    @property
+    def access_flags(self) -> List[DEX.ACCESS_FLAGS]:
+        return access_flags(self.access_mask)
+
+    @property
+    def is_static(self) -> bool:
+        return bool(self.access_mask & DEX.ACCESS_FLAGS.STATIC.value)
+
+    def __str__(self):
+        cls = self.cls[1:-1].replace('/', '.')
+        return f'{fmt_access(self.access_mask)}{self.type} {cls}->{self.name}'
+
+
+@dataclass
+class DexMethod(object):
+    dex: 'DexFile'
+    index: int
+    cls: str
+    name: str
+    proto_index: int
+    access_mask: int = 0
+    code_offset: int = 0
+    code_size: int = 0
+
+    @property
+    def prototype(self) -> DexPrototype:
+        return self.dex.prototypes[self.proto_index]
+
+    @property
+    def access_flags(self) -> List[DEX.ACCESS_FLAGS]:
+        return access_flags(self.access_mask)
+
+    @property
+    def bytecode(self) -> memoryview:
+        return self.dex.view[self.code_offset : self.code_offset + self.code_size]
+
+    def __str__(self):
+        proto = self.prototype
+        params = ', '.join(f'{t} p{i}' for i, t in enumerate(proto.parameters_type))
+        cls = self.cls[1:-1].replace('/', '.')
+        flags = fmt_access(self.access_mask)
+        return f'{flags}{proto.return_type} {cls}->{self.name}({params})'
+
+
+@dataclass
+class DexClass(object):
+    dex: 'DexFile'
+    index: int
+    type_index: int
+    fullname: str
+    access_mask: int = 0
+    class_data_off: int = 0
+
+    @property
+    def package_name(self) -> str:
+        return class_path(self.fullname)[0]
+
+    @property
+    def name(self) -> str:
+        return class_path(self.fullname)[1]
+
+    @property
+    def pretty_name(self) -> str:
+        return self.fullname[1:-1].replace('/', '.')
+
+    @property
+    def access_flags(self) -> List[DEX.ACCESS_FLAGS]:
+        return access_flags(self.access_mask)
+
+    @cached_property
+    def class_data(self) -> Tuple[Dict[int, int], Dict[int, Tuple[int, int]]]:
+        # flags by field id, flags and code_item offset by method id
+        fields: Dict[int, int] = {}
+        methods: Dict[int, Tuple[int, int]] = {}
+        if not self.class_data_off:
+            return fields, methods
+
+        view = self.dex.view
+        pos = self.class_data_off
+        sizes = []
+        for _ in range(4):
+            size, pos = read_uleb128(view, pos)
+            sizes.append(size)
+
+        for i, size in enumerate(sizes):
+            index = 0
+            for _ in range(size):
+                diff, pos = read_uleb128(view, pos)
+                mask, pos = read_uleb128(view, pos)
+                index += diff
+                if i < 2:
+                    fields[index] = mask
+                    continue
+                code_off, pos = read_uleb128(view, pos)
+                methods[index] = (mask, code_off)
+        return fields, methods
+
+    @cached_property
+    def _members(self) -> Tuple[List[DexField], List[DexMethod]]:
+        dex = self.dex
+        declared_fields, declared_methods = self.class_data
+        fields = [dex.fields[index] for index in declared_fields]
+        methods = [dex.methods[index] for index in declared_methods]
+
+        # members referenced from this dex but not declared in class_data
+        for index in dex.field_ids_by_class.get(self.type_index, ()):
+            if index not in declared_fields:
+                fields.append(dex.fields[index])
+        for index in dex.method_ids_by_class.get(self.type_index, ()):
+            if index not in declared_methods:
+                methods.append(dex.methods[index])
+        return fields, methods
+
+    @property
+    def fields(self) -> List[DexField]:
+        return self._members[0]
+
+    @property
+    def methods(self) -> List[DexMethod]:
+        return self._members[1]
+
+    def __str__(self):
+        return self.pretty_name
+
+
+class DexFile(object):
+    def __init__(self, data: bytes | mmap.mmap, location: str = '', name: str = ''):
+        self.data = data
+        self.view = memoryview(data)
+        self.location = location
+        self.name = name or os.path.basename(location) or 'classes.dex'
+        self.header = header = DexHeader.parse(self.view)
+
+        self.string_ids = self._section(
+            header.string_ids_off, header.string_ids_size, 4, 'I'
+        )
+        self.type_ids = self._section(header.type_ids_off, header.type_ids_size, 4, 'I')
+        self.proto_ids = self._section(
+            header.proto_ids_off, header.proto_ids_size, 12, 'I'
+        )
+        self.field_ids = self._section(
+            header.field_ids_off, header.field_ids_size, 8, 'H'
+        )
+        self.method_ids = self._section(
+            header.method_ids_off, header.method_ids_size, 8, 'H'
+        )
+        self.class_defs = self._section(
+            header.class_defs_off, header.class_defs_size, 32, 'I'
+        )
+
+        self.strings = PoolTable(range(header.string_ids_size), self._load_string)
+        self.descriptors = PoolTable(range(header.type_ids_size), self._load_descriptor)
+        self.types = PoolTable(range(header.type_ids_size), self._load_type)
+        self.prototypes = PoolTable(range(header.proto_ids_size), self._load_prototype)
+        self.fields = PoolTable(range(header.field_ids_size), self._load_field)
+        self.methods = PoolTable(range(header.method_ids_size), self._load_method)
+
+    @staticmethod
+    def parse(path: str) -> Optional[Self]:
+        if not is_dex(path):
+            return None
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return DexFile(data, path)
+
+    def _section(self, offset: int, count: int, item_size: int, fmt: str) -> memoryview:
+        return self.view[offset : offset + count * item_size].cast(fmt)
+
+    def _load_string(self, index: int) -> str:
+        _, pos = read_uleb128(self.view, self.string_ids[index])
+        end = self.data.find(b'\0', pos)
+        return decode_mutf8(self.data[pos:end])
+
+    def _load_descriptor(self, index: int) -> str:
+        return self.strings[self.type_ids[index]]
+
+    def _load_type(self, index: int) -> str:
+        return type_name(self.descriptors[index])
+
+    def _load_prototype(self, index: int) -> DexPrototype:
+        _, return_type, parameters_off = self.proto_ids[3 * index : 3 * index + 3]
+        parameters = ()
+        if parameters_off:
+            (size,) = struct.unpack_from('<I', self.view, parameters_off)
+            indices = struct.unpack_from('<%dH' % size, self.view, parameters_off + 4)
+            parameters = tuple(self.types[i] for i in indices)
+        return DexPrototype(parameters, self.types[return_type])
+
+    def _load_field(self, index: int) -> DexField:
+        cls, type, name_lo, name_hi = self.field_ids[4 * index : 4 * index + 4]
+        name = self.strings[name_lo | name_hi << 16]
+        field = DexField(self, index, self.descriptors[cls], name, self.types[type])
+
+        # flags come from the defining class, whichever member is read first
+        owner = self.class_defs_by_type.get(cls)
+        if owner is not None:
+            field.access_mask = owner.class_data[0].get(index, 0)
+        return field
+
+    def _load_method(self, index: int) -> DexMethod:
+        cls, proto, name_lo, name_hi = self.method_ids[4 * index : 4 * index + 4]
+        name = self.strings[name_lo | name_hi << 16]
+        mask = (
+            DEX.ACCESS_FLAGS.CONSTRUCTOR.value if name in ('<init>', '<clinit>') else 0
+        )
+        method = DexMethod(self, index, self.descriptors[cls], name, proto, mask)
+
+        # flags and code come from the defining class, not from reading it first
+        owner = self.class_defs_by_type.get(cls)
+        entry = owner.class_data[1].get(index) if owner is not None else None
+        if entry is not None:
+            method.access_mask, code_off = entry
+            if code_off:
+                (insns_size,) = struct.unpack_from('<I', self.view, code_off + 12)
+                method.code_offset = code_off + 16
+                method.code_size = insns_size * 2
+        return method
+
+    @cached_property
+    def field_ids_by_class(self) -> Dict[int, List[int]]:
+        return self._group_by_class(self.field_ids)
+
+    @cached_property
+    def method_ids_by_class(self) -> Dict[int, List[int]]:
+        return self._group_by_class(self.method_ids)
+
+    def _group_by_class(self, ids: memoryview) -> Dict[int, List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for index, cls in enumerate(ids[::4]):
+            groups.setdefault(cls, []).append(index)
+        return groups
+
+    @cached_property
+    def class_defs_by_type(self) -> Dict[int, DexClass]:
+        return {c.type_index: c for c in self.classes if c.index != NO_INDEX}
+
+    @cached_property
+    def classes(self) -> List[DexClass]:
+        classes = []
+        defined = set()
+        for index in range(len(self.class_defs) // 8):
+            type_index, mask, *_, class_data_off, _ = self.class_defs[
+                8 * index : 8 * index + 8
+            ]
+            defined.add(type_index)
+            descriptor = self.descriptors[type_index]
+            classes.append(
+                DexClass(self, index, type_index, descriptor, mask, class_data_off)
+            )
+
+        # referenced classes without a class_def follow in type_id order, that is
+        # sorted by descriptor, lief lists them in the order of its own tables
+        type_ids = {self.descriptors[i]: i for i in range(len(self.descriptors))}
+        seen = set()
+        for type_index in range(len(self.descriptors)):
+            descriptor = self.descriptors[type_index].lstrip('[')
+            if descriptor[0] != 'L' or descriptor in seen:
+                continue
+            seen.add(descriptor)
+            type_index = type_ids.get(descriptor, NO_INDEX)
+            if type_index not in defined:
+                classes.append(DexClass(self, NO_INDEX, type_index, descriptor))
+        return classes
+
+
+def is_dex(path: str) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(4) == DEX_MAGIC
+    except OSError:
+        return False
@@ -0,0 +1,187 @@
+import marshal
+from collections import Counter
+from hashlib import blake2b
+from typing_extensions import Dict, Iterator, List, Tuple
+from dextree.classcache import CODE_SIZE
+from dextree.dex_ints import POOL_JUMBO_STRING, scan_pool_refs
+from dextree.pools import DexPools, PoolTable
+from dextree.treeformat import fmt_class, fmt_method, fmt_package, fmt_string
+from dextree.treemaker import LazyTreeClass, TreeClass, TreeMethod, TreePackage
+from dextree.xrefs import field_name, method_name
+
+DIGEST_SIZE = 16
+
+# sign, kind, formatted name and nesting level of one difference
+Change = Tuple[str, str, str, int]
+
+
+def method_key(item: TreeMethod) -> Tuple:
+    return (item.name, item.parameter_types, item.return_type)
+
+
+def field_operand(field) -> str:
+    return f'{field_name(field)}:{field.type}'
+
+
+def method_operand(method) -> str:
+    proto = method.prototype
+    params = ','.join(map(str, proto.parameters_type))
+    return f'{method_name(method)}({params}){proto.return_type}'
+
+
+def dotted(path: str, name: str) -> str:
+    return f'{path}/{name}'.replace('/', '.') if path else name
+
+
+class TreeDigests(object):
+    # merkle hashes, equal digests mean equal subtrees
+    def __init__(self):
+        self.digests: Dict[int, bytes] = {}
+        self.codes: Dict[int, bytes] = {}
+        self.operands: Dict[int, List[PoolTable]] = {}
+
+    def method(self, item: TreeMethod) -> bytes:
+        digest = self.digests.get(id(item))
+        if digest is None:
+            data = (
+                *method_key(item),
+                item.access_mask,
+                [s.value for s in item.string_values],
+            )
+            digest = blake2b(marshal.dumps(data), digest_size=DIGEST_SIZE).digest()
+            self.digests[id(item)] = digest
+        return digest
+
+    def clazz(self, item: TreeClass) -> bytes:
+        digest = self.digests.get(id(item))
+        if digest is None:
+            fields = [
+                (f.name, f.type, f.is_static, f.string_value and f.string_value.value)
+                for f in item.fields
+            ]
+            methods = sorted(self.method(m) for m in item.methods)
+            data = marshal.dumps((item.name, fields, methods))
+            digest = blake2b(data, digest_size=DIGEST_SIZE).digest()
+            self.digests[id(item)] = digest
+        return digest
+
+    def pool_tables(self, pools: DexPools) -> List[PoolTable]:
+        # operand text by pool kind, the same in every dex that names it
+        tables = self.operands.get(id(pools))
+        if tables is None:
+            fields = PoolTable(pools.fields.items, field_operand)
+            methods = PoolTable(pools.methods.items, method_operand)
+            tables = [None, pools.strings, pools.strings, pools.types, fields, methods]
+            self.operands[id(pools)] = tables
+        return tables
+
+    def code(self, item: TreeClass) -> bytes:
+        # lazy classes are compared by their code, nothing is decoded for it
+        if not isinstance(item, LazyTreeClass):
+            return self.clazz(item)
+        digest = self.codes.get(id(item))
+        if digest is None:
+            pools = item.decoder.pools
+            tables = self.pool_tables(pools)
+            fields = [(f.name, f.type, f.is_static) for f in item.fields]
+            methods = [(*method_key(m), m.access_mask) for m in item.methods]
+            data = marshal.dumps((item.name, fields, methods))
+            hasher = blake2b(data, digest_size=DIGEST_SIZE)
+            for method in item.clazz.methods:
+                buffer = pools.code(method)
+                hasher.update(CODE_SIZE.pack(len(buffer)))
+
+                # pool ids shift between builds, what they name does not
+                operands = []
+                last = 0
+                for offset, kind, index in scan_pool_refs(buffer):
+                    hasher.update(buffer[last:offset])
+                    table = tables[kind]
+                    # broken code may point past a pool, its raw index is kept
+                    operands.append(table[index] if index < len(table) else index)
+                    last = offset + (4 if kind == POOL_JUMBO_STRING else 2)
+                hasher.update(buffer[last:])
+                hasher.update(marshal.dumps(operands))
+            digest = self.codes[id(item)] = hasher.digest()
+        return digest
+
+    def changed(self, old: TreeClass, new: TreeClass) -> bool:
+        # equal code means equal classes, different code may still decode the same
+        if self.code(old) == self.code(new):
+            return False
+        return self.clazz(old) != self.clazz(new)
+
+    def package(self, item: TreePackage) -> bytes:
+        digest = self.digests.get(id(item))
+        if digest is None:
+            # children by name, the order they were seen in does not matter
+            packages = [
+                (name, self.package(p)) for name, p in sorted(item.packages.items())
+            ]
+            classes = [(name, self.code(c)) for name, c in sorted(item.classes.items())]
+            data = marshal.dumps((item.name, packages, classes))
+            digest = blake2b(data, digest_size=DIGEST_SIZE).digest()
+            self.digests[id(item)] = digest
+        return digest
+
+
+class TreeDiff(object):
+    def __init__(self):
+        self.digests = TreeDigests()
+
+    def packages(self, old: TreePackage, new: TreePackage) -> Iterator[Change]:
+        digest = self.digests
+        if digest.package(old) == digest.package(new):
+            return
+
+        for name in sorted(old.packages.keys() | new.packages.keys()):
+            a, b = old.packages.get(name), new.packages.get(name)
+            if b is None:
+                yield '-', 'package', fmt_package(dotted(a.path, name)), 0
+            elif a is None:
+                yield '+', 'package', fmt_package(dotted(b.path, name)), 0
+            else:
+                yield from self.packages(a, b)
+
+        for name in sorted(old.classes.keys() | new.classes.keys()):
+            a, b = old.classes.get(name), new.classes.get(name)
+            if b is None:
+                yield '-', 'class', fmt_class(dotted(a.path, name)), 0
+            elif a is None:
+                yield '+', 'class', fmt_class(dotted(b.path, name)), 0
+            elif digest.changed(a, b):
+                yield '~', 'class', fmt_class(dotted(b.path, name)), 0
+                yield from self.classes(a, b)
+
+    def classes(self, old: TreeClass, new: TreeClass) -> Iterator[Change]:
+        digest = self.digests
+        a = {method_key(m): m for m in old.methods}
+        b = {method_key(m): m for m in new.methods}
+        for key, method in a.items():
+            if key not in b:
+                yield '-', 'method', self.signature(method), 1
+        for key, method in b.items():
+            previous = a.get(key)
+            if previous is None:
+                yield '+', 'method', self.signature(method), 1
+            elif digest.method(previous) != digest.method(method):
+                yield '~', 'method', self.signature(method), 1
+                yield from self.strings(previous, method)
+
+    def strings(self, old: TreeMethod, new: TreeMethod) -> Iterator[Change]:
+        a = Counter(s.value for s in old.string_values)
+        b = Counter(s.value for s in new.string_values)
+        for value in a - b:
+            yield '-', 'string', fmt_string(value), 2
+        for value in b - a:
+            yield '+', 'string', fmt_string(value), 2
+
+    @staticmethod
+    def signature(item: TreeMethod) -> str:
+        return fmt_method(
+            item.name, item.parameter_types, item.return_type, item.access_mask
+        )
+
+
+def diff_trees(old: TreePackage, new: TreePackage) -> Iterator[Change]:
+    return TreeDiff().packages(old, new)
@@ -0,0 +1,40 @@
+import re
+from typing_extensions import Iterable, Optional
+
+GLOB_TOKEN = re.compile(r'\*\*/|\*\*|\*|\?|[^*?]+')
+
+
+def glob_pattern(glob: str) -> str:
+    # dotted names are accepted too, class paths use slashes
+    parts = []
+    for token in GLOB_TOKEN.findall(glob.replace('.', '/')):
+        if token == '**/':
+            parts.append('(?:.*/)?')
+        elif token == '**':
+            parts.append('.*')
+        elif token == '*':
+            parts.append('[^/]*')
+        elif token == '?':
+            parts.append('[^/]')
+        else:
+            parts.append(re.escape(token))
+    return ''.join(parts)
+
+
+def compile_globs(globs: Iterable[str]) -> Optional[re.Pattern]:
+    patterns = [glob_pattern(glob) for glob in globs]
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+
+
+class PackageFilter(object):
+    def __init__(self, include: Iterable[str] = (), exclude: Iterable[str] = ()):
+        self.include = compile_globs(include)
+        self.exclude = compile_globs(exclude)
+
+    def __call__(self, package_name: str, name: str) -> bool:
+        path = f'{package_name}/{name}' if package_name else name
+        if self.include is not None and not self.include.fullmatch(path):
+            return False
+        return self.exclude is None or not self.exclude.fullmatch(path)
@@ -0,0 +1,199 @@
+import sqlite3
+from dataclasses import dataclass
+from typing_extensions import Dict, Iterator, List, Optional, Self, Set
+from lief import DEX
+from dextree.dexfile import NO_INDEX, DexFile
+from dextree.pools import DexPools
+from dextree.treeformat import CLASS_NAME_FMT, fmt_function, fmt_string, fmt_type
+from dextree.treemaker import tree_classes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS methods (
+    id INTEGER PRIMARY KEY,
+    file INTEGER NOT NULL,
+    class TEXT NOT NULL,
+    name TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    returns TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS strings (
+    id INTEGER PRIMARY KEY,
+    value TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refs (
+    string INTEGER NOT NULL,
+    method INTEGER NOT NULL,
+    PRIMARY KEY (string, method)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS trigrams (
+    trigram TEXT NOT NULL,
+    string INTEGER NOT NULL,
+    PRIMARY KEY (trigram, string)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS methods_file ON methods (file);
+CREATE INDEX IF NOT EXISTS refs_method ON refs (method);
+"""
+
+MATCHES = """
+SELECT files.path, methods.class, methods.name, methods.parameters, methods.returns, strings.value
+FROM strings
+JOIN refs ON refs.string = strings.id
+JOIN methods ON methods.id = refs.method
+JOIN files ON files.id = methods.file
+WHERE strings.id IN ({})
+ORDER BY files.path, methods.id, strings.value
+"""
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+@dataclass
+class IndexMatch(object):
+    file: str
+    cls: str
+    name: str
+    parameters: str
+    returns: str
+    value: str
+
+    def __str__(self):
+        params = (
+            ', '.join(map(fmt_type, self.parameters.split(', ')))
+            if self.parameters
+            else ''
+        )
+        method = (
+            f'{CLASS_NAME_FMT(self.cls.replace("/", "."))}.{fmt_function(self.name)}'
+        )
+        return f'{self.file}: {method}({params}): {fmt_string(self.value)}'
+
+
+class StringIndex(object):
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        self.strings: Dict[str, int] = {}
+
+    @staticmethod
+    def open(path: str) -> Self:
+        connection = sqlite3.connect(path)
+        connection.executescript(SCHEMA)
+        return StringIndex(connection)
+
+    def close(self):
+        self.connection.close()
+
+    def is_current(self, path: str, signature: bytes) -> bool:
+        row = self.connection.execute(
+            'SELECT signature FROM files WHERE path = ?', (path,)
+        ).fetchone()
+        return row is not None and row[0] == signature
+
+    def add_file(self, path: str, signature: bytes) -> int:
+        db = self.connection
+        row = db.execute('SELECT id FROM files WHERE path = ?', (path,)).fetchone()
+        if row is None:
+            return db.execute(
+                'INSERT INTO files (path, signature) VALUES (?, ?)', (path, signature)
+            ).lastrowid
+
+        # a rebuilt file replaces everything indexed for it before
+        file = row[0]
+        db.execute('UPDATE files SET signature = ? WHERE id = ?', (signature, file))
+        db.execute(
+            'DELETE FROM refs WHERE method IN (SELECT id FROM methods WHERE file = ?)',
+            (file,),
+        )
+        db.execute('DELETE FROM methods WHERE file = ?', (file,))
+        db.execute('DELETE FROM strings WHERE id NOT IN (SELECT string FROM refs)')
+        db.execute('DELETE FROM trigrams WHERE string NOT IN (SELECT id FROM strings)')
+        self.strings.clear()
+        return file
+
+    def string_id(self, value: str) -> int:
+        id = self.strings.get(value)
+        if id is not None:
+            return id
+
+        db = self.connection
+        row = db.execute('SELECT id FROM strings WHERE value = ?', (value,)).fetchone()
+        if row is not None:
+            id = row[0]
+        else:
+            id = db.execute(
+                'INSERT INTO strings (value) VALUES (?)', (value,)
+            ).lastrowid
+            db.executemany(
+                'INSERT INTO trigrams (trigram, string) VALUES (?, ?)',
+                ((trigram, id) for trigram in trigrams(value)),
+            )
+        self.strings[value] = id
+        return id
+
+    def add_dex(
+        self,
+        file: int,
+        dex: DEX.File | DexFile | DexPools,
+        jobs=1,
+        source: Optional[str] = None,
+    ):
+        db = self.connection
+        seen = set()
+        for clazz, item in tree_classes(dex, code=True, jobs=jobs, source=source):
+            if clazz.index == NO_INDEX:
+                # referenced classes carry no code
+                continue
+            cls = f'{item.path}/{item.name}' if item.path else item.name
+            if cls in seen:
+                continue
+            seen.add(cls)
+
+            for method in item.methods:
+                if not method.string_values:
+                    continue
+                parameters = ', '.join(method.parameter_types)
+                id = db.execute(
+                    'INSERT INTO methods (file, class, name, parameters, returns) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (file, cls, method.name, parameters, method.return_type),
+                ).lastrowid
+                strings = {self.string_id(s.value) for s in method.string_values}
+                db.executemany(
+                    'INSERT INTO refs (string, method) VALUES (?, ?)',
+                    ((string, id) for string in strings),
+                )
+
+    def find_strings(self, text: str, exact=False) -> List[int]:
+        db = self.connection
+        if exact:
+            rows = db.execute('SELECT id FROM strings WHERE value = ?', (text,))
+        elif len(text) < 3:
+            rows = db.execute(
+                'SELECT id FROM strings WHERE instr(value, ?) > 0', (text,)
+            )
+        else:
+            # candidates hold every trigram of the text, then really contain it
+            grams = sorted(trigrams(text))
+            rows = db.execute(
+                'SELECT id FROM strings WHERE id IN ('
+                'SELECT string FROM trigrams WHERE trigram IN ({}) '
+                'GROUP BY string HAVING count(*) = ?'
+                ') AND instr(value, ?) > 0'.format(', '.join('?' * len(grams))),
+                (*grams, len(grams), text),
+            )
+        return [row[0] for row in rows]
+
+    def query(self, text: str, exact=False) -> Iterator[IndexMatch]:
+        ids = self.find_strings(text, exact)
+        # stay below the bound parameter limit of sqlite
+        for start in range(0, len(ids), 10000):
+            chunk = ids[start : start + 10000]
+            sql = MATCHES.format(', '.join('?' * len(chunk)))
+            for row in self.connection.execute(sql, chunk):
+                yield IndexMatch(*row)
@@ -1,79 +1,523 @@
-import lief
+import cProfile
+import importlib.util
+import io
+import os
+import sys
 import typer
-from colors import color
-from lief import DEX
-from typing_extensions import Annotated, List
-from dextree.treeformat import (
-    fmt_type,
-    fmt_function,
-    fmt_string,
-    fmt_field,
-    fmt_bracket,
-    fmt_keyword,
-)
-from dextree.treemaker import (
-    TreeClass,
-    TreeField,
-    TreeMethod,
-    TreePackage,
-    TreeString,
-    treeify,
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from itertools import repeat
+from typing_extensions import Annotated, List, Optional, TextIO
+from dextree.cache import TreeCache
+from dextree.classcache import ClassCache
+from dextree.diff import diff_trees
+from dextree import profiling
+from dextree.filters import PackageFilter
+from dextree.profiling import Profiler, phase
+from dextree.index import StringIndex
+from dextree.pools import DexPools
+from dextree.records import RecordStream, jsonl_writer, msgpack_writer
+from dextree.render import TreeRenderer
+from dextree.sources import Backend, load_dexes, probe, read_signatures
+from dextree.treeformat import fmt_keyword, set_colors
+from dextree.treemaker import Engine, RootPackage, treeify
+from dextree.xrefs import (
+    XrefIndex,
+    XrefStore,
+    field_name,
+    find_members,
+    fmt_xref_field,
+    fmt_xref_method,
+    method_name,
 )
 
 
-def logme(item, depth):
-    pad = ''
-    if len(depth) > 0:
-        for open in depth[:-1]:
-            pad += '│' if open else ' '
-        pad += '├' if depth[-1] else '└'
-    pad = color(pad, fg='#585b70')
-
-    text = f'{item}'
-    if isinstance(item, TreePackage):
-        text = color(item.name, fg='#f5e0dc')
-    elif isinstance(item, TreeClass):
-        text = f'{color(item.name, fg="#f2cdcd")}.{color("class", style="faint")}'
-    elif isinstance(item, TreeField):
-        name = fmt_field(item.name)
-        type = fmt_type(item.type)
-        text = f'{type} {name}'
-    elif isinstance(item, TreeMethod):
-        params = ', '.join(map(fmt_type, item.parameter_types))
-        ret = fmt_type(item.return_type)
-        name = fmt_function(item.name)
-        flags = ' '.join(map(lambda p: fmt_keyword(p.__name__), item.access_flags))
-        flags = flags + ' ' if len(flags) > 0 else ''
-        text = f'{flags}{ret} {name}{fmt_bracket("(")}{params}{fmt_bracket(")")}'
-    elif isinstance(item, TreeString):
-        text = fmt_string(item.value)
-
-    print(f'{pad}{text}')
-
-
-def main(files: Annotated[List[str], typer.Argument()]):
+OUTPUT_BUFFER = 1 << 20
+
+
+class ColorMode(str, Enum):
+    auto = 'auto'
+    always = 'always'
+    never = 'never'
+
+
+class OutputFormat(str, Enum):
+    tree = 'tree'
+    jsonl = 'jsonl'
+    msgpack = 'msgpack'
+
+
+def class_filter(include: List[str], exclude: List[str]) -> Optional[PackageFilter]:
+    return PackageFilter(include, exclude) if include or exclude else None
+
+
+def build_tree(
+    file: str,
+    backend: Backend,
+    jobs: int = 1,
+    select: Optional[PackageFilter] = None,
+    engine: Engine = Engine.python,
+    classes: Optional[ClassCache] = None,
+    lazy=False,
+) -> RootPackage:
+    root = RootPackage()
+
+    # build one tree from every dex of the file
+    for pools, source in load_dexes(file, backend):
+        with phase('tree'):
+            treeify(
+                pools,
+                code=True,
+                fields=False,
+                jobs=jobs,
+                source=source,
+                root=root,
+                select=select,
+                engine=engine,
+                classes=classes,
+                lazy=lazy,
+            )
+    return root
+
+
+def dump_file(
+    file: str,
+    out: TextIO,
+    backend: Backend,
+    jobs: int = 1,
+    cache: Optional[TreeCache] = None,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    engine: Engine = Engine.python,
+):
+    include = include or []
+    exclude = exclude or []
+    select = class_filter(include, exclude)
+    if cache is None:
+        root = build_tree(file, backend, jobs, select, engine)
+    else:
+        key = cache.key(
+            read_signatures(file),
+            backend=backend.value,
+            code=True,
+            fields=False,
+            include=include,
+            exclude=exclude,
+        )
+        with phase('cache'):
+            root = cache.load(key)
+        if root is None:
+            # classes unchanged since an earlier build are not decoded again
+            # the class cache gets what the stored trees leave of --cache-size
+            classes = ClassCache.open(
+                cache.directory, max(0, cache.max_size - cache.size())
+            )
+            try:
+                root = build_tree(file, backend, jobs, select, engine, classes)
+            finally:
+                with phase('cache'):
+                    classes.close()
+            with phase('cache'):
+                cache.store(key, root)
+
+    # iterate all over tree
+    with phase('render'):
+        root.iterate(TreeRenderer(out))
+
+
+def stream_files(
+    files: List[str],
+    output: OutputFormat,
+    backend: Backend,
+    jobs: int,
+    select: Optional[PackageFilter] = None,
+    engine: Engine = Engine.python,
+):
+    # records are written as classes are decoded, no tree is kept around
+    sys.stdout.flush()
+    if output == OutputFormat.msgpack:
+        out = open(sys.stdout.fileno(), 'wb', buffering=OUTPUT_BUFFER, closefd=False)
+        try:
+            emit = msgpack_writer(out)
+        except ImportError as err:
+            out.close()
+            raise typer.BadParameter(
+                'msgpack output needs the msgpack package'
+            ) from err
+    else:
+        out = open(
+            sys.stdout.fileno(),
+            'w',
+            buffering=OUTPUT_BUFFER,
+            encoding='utf-8',
+            closefd=False,
+        )
+        emit = jsonl_writer(out)
+
+    with out:
+        stream = RecordStream(emit)
+        for file in files:
+            stream_file(file, stream, backend, jobs, select, engine)
+
+
+def stream_file(
+    file: str,
+    stream: RecordStream,
+    backend: Backend,
+    jobs: int = 1,
+    select: Optional[PackageFilter] = None,
+    engine: Engine = Engine.python,
+):
+    stream.file(file)
+    for pools, source in load_dexes(file, backend):
+        with phase('records'):
+            stream.dex(
+                pools,
+                code=True,
+                fields=False,
+                jobs=jobs,
+                source=source,
+                select=select,
+                engine=engine,
+            )
+    stream.end_file()
+
+
+def render_file(
+    file: str,
+    backend: Backend,
+    cache: Optional[TreeCache],
+    colors: bool,
+    include: List[str],
+    exclude: List[str],
+    engine: Engine,
+) -> str:
+    set_colors(colors)
+    with io.StringIO() as out:
+        dump_file(
+            file,
+            out,
+            backend,
+            cache=cache,
+            include=include,
+            exclude=exclude,
+            engine=engine,
+        )
+        return out.getvalue()
+
+
+def main(
+    files: Annotated[List[str], typer.Argument()],
+    backend: Annotated[Backend, typer.Option(help='dex reader')] = Backend.lief,
+    jobs: Annotated[
+        int, typer.Option('--jobs', '-j', min=1, help='files processed in parallel')
+    ] = 1,
+    cache_dir: Annotated[
+        Optional[str], typer.Option('--cache', help='tree and class cache directory')
+    ] = None,
+    cache_size: Annotated[
+        int, typer.Option(min=1, help='tree and class cache limit in MB')
+    ] = 256,
+    color: Annotated[ColorMode, typer.Option(help='colored output')] = ColorMode.auto,
+    output: Annotated[
+        OutputFormat, typer.Option('--format', help='output format')
+    ] = OutputFormat.tree,
+    include: Annotated[
+        Optional[List[str]],
+        typer.Option(help='only classes matching this glob, like com/app/**'),
+    ] = None,
+    exclude: Annotated[
+        Optional[List[str]],
+        typer.Option(help='skip classes matching this glob, like androidx/**'),
+    ] = None,
+    profile: Annotated[
+        Optional[str], typer.Option(help='write phase timings and counters as JSON')
+    ] = None,
+    pstats: Annotated[
+        Optional[str], typer.Option(help='write a cProfile stats dump')
+    ] = None,
+    engine: Annotated[
+        Engine, typer.Option(help='bytecode scanner, numpy needs numpy installed')
+    ] = Engine.python,
+):
+    include = include or []
+    exclude = exclude or []
+    cache = TreeCache(cache_dir, cache_size << 20) if cache_dir else None
+    colors = color == ColorMode.always or (
+        color == ColorMode.auto and sys.stdout.isatty()
+    )
+    set_colors(colors)
+
+    if engine == Engine.numpy and importlib.util.find_spec('numpy') is None:
+        raise typer.BadParameter('the numpy engine needs the numpy package')
+
+    profiler = Profiler.start() if profile else None
+    stats = cProfile.Profile() if pstats else None
+    if stats is not None:
+        stats.enable()
+
     # validate args
-    for file in files:
-        if not lief.is_dex(file):
-            raise typer.Abort(f'not a dex file: {file}')
+    with phase('probe'):
+        for file in files:
+            if probe(file) is None:
+                raise typer.Abort(f'not a dex file or archive: {file}')
+
+    try:
+        dump_files(
+            files, backend, jobs, cache, colors, output, include, exclude, engine
+        )
+    finally:
+        if stats is not None:
+            stats.disable()
+            stats.dump_stats(pstats)
+        if profiler is not None:
+            profiler.dump(profile)
+
+
+def dump_files(
+    files: List[str],
+    backend: Backend,
+    jobs: int,
+    cache: Optional[TreeCache],
+    colors: bool,
+    output: OutputFormat,
+    include: List[str],
+    exclude: List[str],
+    engine: Engine,
+):
+    if output != OutputFormat.tree:
+        stream_files(
+            files, output, backend, jobs, class_filter(include, exclude), engine
+        )
+        return
+
+    # one large buffer for the whole output instead of a write per line
+    sys.stdout.flush()
+    with open(
+        sys.stdout.fileno(),
+        'w',
+        buffering=OUTPUT_BUFFER,
+        encoding='utf-8',
+        closefd=False,
+    ) as out:
+        # iterate argument files, a single file is split by classes instead
+        # profiling sees this process only, so files are not farmed out then
+        if jobs == 1 or len(files) == 1 or profiling.active is not None:
+            for file in files:
+                dump_file(file, out, backend, jobs, cache, include, exclude, engine)
+            return
 
-    # iterate argument files
+        # one file per worker, output kept in argument order
+        with ProcessPoolExecutor(min(jobs, len(files))) as pool:
+            texts = pool.map(
+                render_file,
+                files,
+                repeat(backend),
+                repeat(cache),
+                repeat(colors),
+                repeat(include),
+                repeat(exclude),
+                repeat(engine),
+            )
+            for text in texts:
+                out.write(text)
+                out.flush()
+
+
+def index_main(
+    files: Annotated[List[str], typer.Argument()],
+    db: Annotated[str, typer.Option('--db', help='index database')] = 'dextree.db',
+    backend: Annotated[Backend, typer.Option(help='dex reader')] = Backend.lief,
+    jobs: Annotated[
+        int, typer.Option('--jobs', '-j', min=1, help='decoding processes')
+    ] = 1,
+):
     for file in files:
-        dex = DEX.parse(file)
-        assert dex is not None
+        if probe(file) is None:
+            raise typer.Abort(f'not a dex file or archive: {file}')
 
-        # build tree from dex
-        root = treeify(dex, code=True, fields=False)
+    index = StringIndex.open(db)
+    try:
+        for file in files:
+            # unchanged files are not decoded again
+            signature = b''.join(read_signatures(file))
+            if index.is_current(file, signature):
+                continue
+            with index.connection:
+                id = index.add_file(file, signature)
+                for pools, source in load_dexes(file, backend):
+                    index.add_dex(id, pools, jobs=jobs, source=source)
+    finally:
+        index.close()
 
-        # iterate all over tree
-        root.iterate(logme)
 
+def query_main(
+    text: Annotated[str, typer.Argument(help='string or substring to look up')],
+    db: Annotated[str, typer.Option('--db', help='index database')] = 'dextree.db',
+    exact: Annotated[bool, typer.Option(help='match whole strings only')] = False,
+    color: Annotated[ColorMode, typer.Option(help='colored output')] = ColorMode.auto,
+):
+    if not os.path.exists(db):
+        raise typer.Abort(f'no index database: {db}')
+    set_colors(
+        color == ColorMode.always or (color == ColorMode.auto and sys.stdout.isatty())
+    )
 
-def setuptools_main():
-    import sys
+    index = StringIndex.open(db)
+    try:
+        for match in index.query(text, exact):
+            print(match)
+    finally:
+        index.close()
+
+
+def print_xrefs(
+    file: str,
+    pools: DexPools,
+    index: XrefIndex,
+    callers: List[str],
+    callees: List[str],
+    readers: List[str],
+    writers: List[str],
+):
+    if not (callers or callees or readers or writers):
+        print(
+            f'{file}: {index.calls.edges} calls, {index.reads.edges} reads, '
+            f'{index.writes.edges} writes'
+        )
+        return
+
+    # answered from the index, methods are not decoded again
+    methods, fields = pools.methods.items, pools.fields.items
+    found = []
+    for text in callers:
+        for callee in find_members(methods, method_name, text):
+            found += [(caller, 'calls', callee) for caller in index.callers[callee]]
+    for text in callees:
+        for caller in find_members(methods, method_name, text):
+            found += [(caller, 'calls', callee) for callee in index.calls[caller]]
+    for text in readers:
+        for field in find_members(fields, field_name, text):
+            found += [(method, 'reads', field) for method in index.readers[field]]
+    for text in writers:
+        for field in find_members(fields, field_name, text):
+            found += [(method, 'writes', field) for method in index.writers[field]]
 
-    main(sys.argv[1:])
+    for method, word, target in found:
+        if word == 'calls':
+            target = fmt_xref_method(methods[target])
+        else:
+            target = fmt_xref_field(fields[target])
+        print(
+            f'{file}: {fmt_xref_method(methods[method])} {fmt_keyword(word)} {target}'
+        )
+
+
+def xrefs_main(
+    file: Annotated[str, typer.Argument()],
+    callers: Annotated[
+        Optional[List[str]], typer.Option(help='show who calls methods matching this')
+    ] = None,
+    callees: Annotated[
+        Optional[List[str]], typer.Option(help='show what methods matching this call')
+    ] = None,
+    readers: Annotated[
+        Optional[List[str]], typer.Option(help='show who reads fields matching this')
+    ] = None,
+    writers: Annotated[
+        Optional[List[str]], typer.Option(help='show who writes fields matching this')
+    ] = None,
+    db: Annotated[
+        str, typer.Option('--db', help='index database, keeps the xrefs of each dex')
+    ] = 'dextree.db',
+    backend: Annotated[Backend, typer.Option(help='dex reader')] = Backend.lief,
+    color: Annotated[ColorMode, typer.Option(help='colored output')] = ColorMode.auto,
+    include: Annotated[
+        Optional[List[str]], typer.Option(help='only scan classes matching this glob')
+    ] = None,
+    exclude: Annotated[
+        Optional[List[str]], typer.Option(help='skip classes matching this glob')
+    ] = None,
+):
+    callers = callers or []
+    callees = callees or []
+    readers = readers or []
+    writers = writers or []
+    include = include or []
+    exclude = exclude or []
+    if probe(file) is None:
+        raise typer.Abort(f'not a dex file or archive: {file}')
+    set_colors(
+        color == ColorMode.always or (color == ColorMode.auto and sys.stdout.isatty())
+    )
+    select = class_filter(include, exclude)
+    options = f'include={include};exclude={exclude}'
+
+    store = XrefStore.open(db)
+    try:
+        for pools, source in load_dexes(file, backend):
+            # unchanged dexes are answered from the stored index, not scanned again
+            signature = bytes(pools.data[12:32])
+            index = store.load(source, options, signature)
+            if index is None:
+                index = XrefIndex.new(pools, select)
+                store.store(source, options, signature, index)
+            print_xrefs(file, pools, index, callers, callees, readers, writers)
+    finally:
+        store.close()
+
+
+def diff_main(
+    old: Annotated[str, typer.Argument(help='earlier build')],
+    new: Annotated[str, typer.Argument(help='later build')],
+    backend: Annotated[Backend, typer.Option(help='dex reader')] = Backend.lief,
+    color: Annotated[ColorMode, typer.Option(help='colored output')] = ColorMode.auto,
+    include: Annotated[
+        Optional[List[str]],
+        typer.Option(help='only compare classes matching this glob'),
+    ] = None,
+    exclude: Annotated[
+        Optional[List[str]], typer.Option(help='skip classes matching this glob')
+    ] = None,
+):
+    include = include or []
+    exclude = exclude or []
+    for file in (old, new):
+        if probe(file) is None:
+            raise typer.Abort(f'not a dex file or archive: {file}')
+    set_colors(
+        color == ColorMode.always or (color == ColorMode.auto and sys.stdout.isatty())
+    )
+    select = class_filter(include, exclude)
+
+    # classes are compared by their code first, only changed ones are decoded
+    changed = False
+    before = build_tree(old, backend, select=select, lazy=True)
+    after = build_tree(new, backend, select=select, lazy=True)
+    for sign, kind, name, level in diff_trees(before, after):
+        print(f'{"  " * level}{sign} {fmt_keyword(kind)} {name}')
+        changed = True
+    if changed:
+        raise typer.Exit(1)
+
+
+COMMANDS = {
+    'diff': diff_main,
+    'index': index_main,
+    'query': query_main,
+    'xrefs': xrefs_main,
+}
+
+
+def setuptools_main():
+    # subcommands are picked by name, anything else is a file to dump
+    command = COMMANDS.get(sys.argv[1]) if len(sys.argv) > 1 else None
+    if command is not None:
+        sys.argv[0] = f'{sys.argv[0]} {sys.argv.pop(1)}'
+        typer.run(command)
+    else:
+        typer.run(main)
 
 
 if __name__ == '__main__':
-    typer.run(main)
+    setuptools_main()
@@ -0,0 +1,58 @@
+import struct
+from functools import cached_property
+from typing_extensions import Any, Callable, List, Optional, Sequence
+from lief import DEX
+
+INSNS_SIZE = struct.Struct('<I')
+
+
+class PoolTable(object):
+    def __init__(self, items: Sequence[Any], fmt: Callable[[Any], str] = str):
+        self.items = items
+        self.fmt = fmt
+        self.cache = [None] * len(items)
+
+    def __len__(self):
+        return len(self.cache)
+
+    def __getitem__(self, index: int) -> str:
+        value = self.cache[index]
+        if value is None:
+            value = self.cache[index] = self.fmt(self.items[index])
+        return value
+
+    def take(self, indices: Sequence[int]) -> List[str]:
+        # one pass over the cache, items are only formatted when missing
+        cache = self.cache
+        values = [cache[index] for index in indices]
+        if None in values:
+            values = [self[index] for index in indices]
+        return values
+
+
+class DexPools(object):
+    # owned by whoever decodes the dex, the pools keep their dex alive
+    def __init__(self, dex: DEX.File, data: Optional[memoryview] = None):
+        self.dex = dex
+        if data is not None:
+            self.data = data
+        self.strings = PoolTable(dex.strings)
+        self.types = PoolTable(dex.types)
+        self.fields = PoolTable(dex.fields)
+        self.methods = PoolTable(dex.methods)
+
+    @cached_property
+    def data(self) -> memoryview:
+        # the whole dex, read once, method code is sliced out of it
+        view = getattr(self.dex, 'view', None)
+        if view is not None:
+            return view
+        return memoryview(bytes(self.dex.raw(False)))
+
+    def code(self, method: DEX.Method) -> memoryview:
+        offset = method.code_offset
+        if not offset:
+            return self.data[:0]
+        # insns_size in code units is the last field of the code_item header
+        (size,) = INSNS_SIZE.unpack_from(self.data, offset - 4)
+        return self.data[offset : offset + 2 * size]
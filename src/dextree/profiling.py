@@ -0,0 +1,98 @@
+import json
+import time
+from collections import Counter
+from contextlib import nullcontext
+from typing_extensions import Dict, List, Optional, Self
+from dextree.dex_ints import INSTRUCTIONS, iter_instructions
+from dextree.treeformat import cache_stats
+
+
+class Phase(object):
+    def __init__(self, profiler: 'Profiler', name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.enter(self.name)
+
+    def __exit__(self, *exc):
+        self.profiler.exit()
+
+
+class Profiler(object):
+    def __init__(self):
+        # wall, cpu and calls per phase, time in nested phases is not counted twice
+        self.phases: Dict[str, List[float]] = {}
+        self.stack: List[List] = []
+        self.counters: Counter = Counter()
+        self.opcodes = [0] * 256
+        self.started = (time.perf_counter(), time.process_time())
+
+    def enter(self, name: str):
+        self.stack.append([name, time.perf_counter(), time.process_time(), 0.0, 0.0])
+
+    def exit(self):
+        name, wall, cpu, child_wall, child_cpu = self.stack.pop()
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        entry = self.phases.setdefault(name, [0.0, 0.0, 0])
+        entry[0] += wall - child_wall
+        entry[1] += cpu - child_cpu
+        entry[2] += 1
+        if self.stack:
+            self.stack[-1][3] += wall
+            self.stack[-1][4] += cpu
+
+    def count_opcodes(self, buffer: memoryview):
+        opcodes = self.opcodes
+        for _, inst in iter_instructions(buffer):
+            opcodes[inst.op] += 1
+
+    def add_opcodes(self, counts: List[int]):
+        self.opcodes = [a + b for a, b in zip(self.opcodes, counts)]
+
+    def report(self) -> Dict:
+        wall, cpu = self.started
+        opcodes = Counter()
+        for op, count in enumerate(self.opcodes):
+            if count:
+                opcodes[INSTRUCTIONS[op].label] += count
+        return {
+            'total': {
+                'wall': time.perf_counter() - wall,
+                'cpu': time.process_time() - cpu,
+            },
+            'phases': {
+                name: {'wall': wall, 'cpu': cpu, 'calls': calls}
+                for name, (wall, cpu, calls) in self.phases.items()
+            },
+            'counters': dict(self.counters, instructions=sum(self.opcodes)),
+            'opcodes': dict(opcodes.most_common()),
+            'caches': cache_stats(),
+        }
+
+    def dump(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write('\n')
+
+    @staticmethod
+    def start() -> Self:
+        global active
+        active = Profiler()
+        return active
+
+
+active: Optional[Profiler] = None
+NO_PHASE = nullcontext()
+
+
+def phase(name: str):
+    if active is None:
+        return NO_PHASE
+    return Phase(active, name)
+
+
+def count(name: str, value: int = 1):
+    if active is not None:
+        active.counters[name] += value
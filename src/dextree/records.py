@@ -0,0 +1,129 @@
+import json
+from typing_extensions import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+)
+from lief import DEX
+from dextree.dexfile import NO_INDEX, DexFile
+from dextree.pools import DexPools
+from dextree.treemaker import ClassFilter, Engine, TreeClass, tree_classes
+
+Record = Dict[str, Any]
+
+
+def jsonl_writer(out: TextIO) -> Callable[[Record], None]:
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    write = out.write
+
+    def emit(record: Record):
+        write(encode(record) + '\n')
+
+    return emit
+
+
+def msgpack_writer(out: BinaryIO) -> Callable[[Record], None]:
+    # optional dependency, only needed for this output format
+    import msgpack
+
+    pack = msgpack.Packer().pack
+    write = out.write
+
+    def emit(record: Record):
+        write(pack(record))
+
+    return emit
+
+
+class RecordStream(object):
+    def __init__(self, emit: Callable[[Record], None]):
+        self.emit = emit
+        self.next_id = 0
+        self.packages: Dict[str, int] = {}
+        self.classes: Set[Tuple[str, str]] = set()
+        # referenced-only classes wait until every dex of the file is read
+        self.stubs: Dict[Tuple[str, str], TreeClass] = {}
+
+    def record(self, kind: str, parent: Optional[int], **values) -> int:
+        # ids count up over the whole stream, parents always come first
+        id = self.next_id
+        self.next_id += 1
+        self.emit({'id': id, 'kind': kind, 'parent': parent, **values})
+        return id
+
+    def file(self, name: str) -> int:
+        id = self.record('file', None, name=name)
+        self.packages = {'': id}
+        self.classes = set()
+        self.stubs = {}
+        return id
+
+    def end_file(self):
+        # stubs that no dex of the file defined are listed as they are
+        for key, item in self.stubs.items():
+            if key not in self.classes:
+                self.clazz(item)
+        self.stubs = {}
+
+    def package(self, package_name: str) -> int:
+        id = self.packages.get(package_name)
+        if id is None:
+            path, _, name = package_name.rpartition('/')
+            parent = self.package(path)
+            id = self.packages[package_name] = self.record(
+                'package', parent, path=path, name=name
+            )
+        return id
+
+    def dex(
+        self,
+        dex: DEX.File | DexFile | DexPools,
+        code=False,
+        fields=False,
+        jobs=1,
+        source: Optional[str] = None,
+        select: Optional[ClassFilter] = None,
+        engine: Engine = Engine.python,
+    ):
+        classes = tree_classes(
+            dex, code, fields, jobs, source, select=select, engine=engine
+        )
+        for clazz, item in classes:
+            key = (item.path, item.name)
+            if clazz.index == NO_INDEX:
+                # only referenced here, another dex may still define it
+                self.stubs.setdefault(key, item)
+                continue
+            self.classes.add(key)
+            self.clazz(item)
+
+    def clazz(self, item: TreeClass):
+        record = self.record
+        parent = self.package(item.path)
+        class_id = record('class', parent, path=item.path, name=item.name)
+        for field in item.fields:
+            field_id = record(
+                'field',
+                class_id,
+                name=field.name,
+                type=field.type,
+                static=field.is_static,
+            )
+            if field.string_value is not None:
+                record('string', field_id, value=field.string_value.value)
+        for method in item.methods:
+            method_id = record(
+                'method',
+                class_id,
+                name=method.name,
+                parameters=list(method.parameter_types),
+                returns=method.return_type,
+                flags=method.access_mask,
+            )
+            for string in method.string_values:
+                record('string', method_id, value=string.value)
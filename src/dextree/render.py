@@ -0,0 +1,87 @@
+from typing_extensions import List, TextIO, Tuple
+from dextree.treeformat import (
+    Style,
+    fmt_class,
+    fmt_field,
+    fmt_method,
+    fmt_package,
+    fmt_pad,
+    fmt_string,
+    fmt_type,
+)
+from dextree.treemaker import (
+    TreeClass,
+    TreeField,
+    TreeMethod,
+    TreePackage,
+    TreeString,
+)
+
+
+class TreeRenderer(object):
+    def __init__(self, out: TextIO):
+        self.write = out.write
+        # picked once, plain output never goes through a Style per segment
+        if Style.enabled:
+            self.fmt_pad, self.text = fmt_pad, self.styled_text
+        else:
+            self.fmt_pad, self.text = str, self.plain_text
+        self.opens: List[bool] = []
+        self.prefixes: List[str] = ['']
+        self.pads: List[Tuple[str, str]] = [(self.fmt_pad('└'), self.fmt_pad('├'))]
+
+    def pad(self, depth: List[bool]) -> str:
+        if len(depth) == 0:
+            return self.fmt_pad('')
+
+        # prefixes of unchanged parent levels are reused from the last line
+        opens = depth[:-1]
+        if opens != self.opens:
+            common = 0
+            limit = min(len(opens), len(self.opens))
+            while common < limit and opens[common] == self.opens[common]:
+                common += 1
+            del self.prefixes[common + 1 :]
+            del self.pads[common + 1 :]
+            for open in opens[common:]:
+                prefix = self.prefixes[-1] + ('│' if open else ' ')
+                self.prefixes.append(prefix)
+                self.pads.append(
+                    (self.fmt_pad(prefix + '└'), self.fmt_pad(prefix + '├'))
+                )
+            self.opens = opens
+        return self.pads[len(opens)][depth[-1]]
+
+    def styled_text(self, item) -> str:
+        if isinstance(item, TreeString):
+            return fmt_string(item.value)
+        elif isinstance(item, TreeMethod):
+            return fmt_method(
+                item.name, item.parameter_types, item.return_type, item.access_mask
+            )
+        elif isinstance(item, TreeField):
+            return f'{fmt_type(item.type)} {fmt_field(item.name)}'
+        elif isinstance(item, TreeClass):
+            return fmt_class(item.name)
+        elif isinstance(item, TreePackage):
+            return fmt_package(item.name)
+        return f'{item}'
+
+    def plain_text(self, item) -> str:
+        if isinstance(item, TreeString):
+            return f'"{item.value}"'
+        elif isinstance(item, TreeMethod):
+            # cached per color mode, a hit makes no Style call
+            return fmt_method(
+                item.name, item.parameter_types, item.return_type, item.access_mask
+            )
+        elif isinstance(item, TreeField):
+            return f'{fmt_type(item.type)} {item.name}'
+        elif isinstance(item, TreeClass):
+            return f'{item.name}.class'
+        elif isinstance(item, TreePackage):
+            return item.name
+        return f'{item}'
+
+    def __call__(self, item, depth: List[bool]):
+        self.write(f'{self.pad(depth)}{self.text(item)}\n')
@@ -0,0 +1,112 @@
+import mmap
+import os
+import re
+import zipfile
+from enum import Enum
+from lief import DEX
+from typing_extensions import Iterator, List, Optional, Tuple
+from dextree.dexfile import DEX_MAGIC, DexFile
+from dextree.pools import DexPools
+from dextree.profiling import phase
+
+ZIP_MAGIC = b'PK\x03\x04'
+DEX_ENTRY = re.compile(r'(?:([^/]+)/dex/)?classes(\d*)\.dex')
+
+
+class Backend(str, Enum):
+    lief = 'lief'
+    native = 'native'
+
+
+class Kind(str, Enum):
+    dex = 'dex'
+    archive = 'archive'
+
+
+def probe(file: str) -> Optional[Kind]:
+    try:
+        with open(file, 'rb') as f:
+            magic = f.read(4)
+    except OSError:
+        return None
+    if magic == DEX_MAGIC:
+        return Kind.dex
+    if magic == ZIP_MAGIC:
+        return Kind.archive
+    return None
+
+
+def dex_entries(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    entries = []
+    for info in archive.infolist():
+        match = DEX_ENTRY.fullmatch(info.filename)
+        if match:
+            # classes.dex, classes2.dex, ... per bundle module
+            key = (match[1] or '', int(match[2] or 1))
+            entries.append((key, info))
+    return [info for _, info in sorted(entries, key=lambda entry: entry[0])]
+
+
+def read_archive(file: str) -> Iterator[Tuple[str, bytes]]:
+    with zipfile.ZipFile(file) as archive:
+        for info in dex_entries(archive):
+            yield f'{file}!{info.filename}', archive.read(info)
+
+
+def read_signatures(file: str) -> List[bytes]:
+    if probe(file) == Kind.archive:
+        with zipfile.ZipFile(file) as archive:
+            headers = [archive.open(info).read(32) for info in dex_entries(archive)]
+    else:
+        with open(file, 'rb') as f:
+            headers = [f.read(32)]
+    return [header[12:32] for header in headers]
+
+
+def parse_dex(file: str, backend: Backend) -> DEX.File | DexFile:
+    if backend == Backend.native:
+        return DexFile.parse(file)
+    return DEX.parse(file)
+
+
+def parse_dex_bytes(data: bytes, name: str, backend: Backend) -> DEX.File | DexFile:
+    if backend == Backend.native:
+        return DexFile(data, name=name)
+    return DEX.parse(memoryview(data), name)
+
+
+def map_file(file: str) -> mmap.mmap:
+    with open(file, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_source(source: str) -> bytes | mmap.mmap:
+    # a dex file, or an archive entry named the way read_archive does
+    if not os.path.isfile(source):
+        file, _, name = source.rpartition('!')
+        with zipfile.ZipFile(file) as archive:
+            return archive.read(name)
+    return map_file(source)
+
+
+def load_dexes(file: str, backend: Backend) -> Iterator[Tuple[DexPools, Optional[str]]]:
+    # method code is sliced from the bytes read here, never copied out of lief
+    if probe(file) == Kind.archive:
+        entries = read_archive(file)
+        while True:
+            with phase('read'):
+                name, data = next(entries, (None, None))
+            if name is None:
+                return
+            with phase('parse'):
+                dex = parse_dex_bytes(data, name, backend)
+            # workers read the entry again by this name
+            yield DexPools(dex, memoryview(data)), name
+    else:
+        with phase('parse'):
+            dex = parse_dex(file, backend)
+        assert dex is not None
+        if backend == Backend.native:
+            yield DexPools(dex), file
+        else:
+            yield DexPools(dex, memoryview(map_file(file))), file
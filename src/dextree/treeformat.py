@@ -1,24 +1,52 @@
+from functools import lru_cache
 from lief import DEX
 from colors import color
+from typing_extensions import Dict, Tuple
+from dextree.dexfile import access_flags
 
+TYPE_CACHE_SIZE = 4096
+SIGNATURE_CACHE_SIZE = 65536
 
-CLASS_FMT = lambda t: color(t, fg='yellow')
-PRIMITIVE_FMT = lambda t: color(t, fg='yellow')
-ARRAY_BRACKETS_FMT = lambda t: color(t, fg='red')
-FUNCTION_FMT = lambda t: color(t, fg='blue')
-FIELD_FMT = lambda t: color(t, fg='#b4befe')
-STRING_FMT = lambda t: color(t, fg='green')
-BRACKET_FMT = lambda t: color(t, fg='#94e2d5')
-KEYWORD_FMT = lambda t: color(t, fg='#cba6f7')
+
+class Style(object):
+    enabled = True
+
+    def __init__(self, **kwargs):
+        # escape sequences are computed once, not per formatted text
+        self.start, self.end = color('\0', **kwargs).split('\0')
+
+    def __call__(self, text: str) -> str:
+        if Style.enabled:
+            return f'{self.start}{text}{self.end}'
+        return text
+
+
+def set_colors(enabled: bool):
+    Style.enabled = enabled
+
+
+CLASS_FMT = Style(fg='yellow')
+PRIMITIVE_FMT = Style(fg='yellow')
+ARRAY_BRACKETS_FMT = Style(fg='red')
+FUNCTION_FMT = Style(fg='blue')
+FIELD_FMT = Style(fg='#b4befe')
+STRING_FMT = Style(fg='green')
+BRACKET_FMT = Style(fg='#94e2d5')
+KEYWORD_FMT = Style(fg='#cba6f7')
+PAD_FMT = Style(fg='#585b70')
+PACKAGE_FMT = Style(fg='#f5e0dc')
+CLASS_NAME_FMT = Style(fg='#f2cdcd')
+FAINT_FMT = Style(style='faint')
 
 
 def fmt_type(type: DEX.Type | str) -> str:
-    type_text = f'{type}'.replace('[]', '')
-    dim = (
-        type.dim
-        if isinstance(type, DEX.Type)
-        else (len(f'{type}') - len(type_text)) // 2
-    )
+    return fmt_descriptor(f'{type}', Style.enabled)
+
+
+@lru_cache(maxsize=TYPE_CACHE_SIZE)
+def fmt_descriptor(descriptor: str, colored: bool) -> str:
+    type_text = descriptor.replace('[]', '')
+    dim = (len(descriptor) - len(type_text)) // 2
 
     type_text = type_text.replace('/', '.').strip()
     if len(type_text) == 0:
@@ -35,6 +63,38 @@ def fmt_type(type: DEX.Type | str) -> str:
     return f'{type_text}{ARRAY_BRACKETS_FMT(array_text)}'
 
 
+def fmt_method(
+    name: str,
+    parameter_types: Tuple[str, ...],
+    return_type: str,
+    access_mask: int,
+) -> str:
+    return fmt_signature(name, parameter_types, return_type, access_mask, Style.enabled)
+
+
+@lru_cache(maxsize=SIGNATURE_CACHE_SIZE)
+def fmt_signature(
+    name: str,
+    parameter_types: Tuple[str, ...],
+    return_type: str,
+    access_mask: int,
+    colored: bool,
+) -> str:
+    params = ', '.join(map(fmt_type, parameter_types))
+    ret = fmt_type(return_type)
+    flags = ''.join(fmt_keyword(p.__name__) + ' ' for p in access_flags(access_mask))
+    return (
+        f'{flags}{ret} {fmt_function(name)}{fmt_bracket("(")}{params}{fmt_bracket(")")}'
+    )
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    return {
+        name: cache.cache_info()._asdict()
+        for name, cache in (('types', fmt_descriptor), ('signatures', fmt_signature))
+    }
+
+
 def fmt_function(name: str) -> str:
     if len(name) == 0:
         return 0
@@ -46,7 +106,7 @@ def fmt_field(name: str) -> str:
 
 
 def fmt_string(string: str) -> str:
-    return f'{STRING_FMT(string)}'
+    return STRING_FMT(f'"{string}"')
 
 
 def fmt_bracket(bracket: str) -> str:
@@ -55,3 +115,15 @@ def fmt_bracket(bracket: str) -> str:
 
 def fmt_keyword(word: str) -> str:
     return f'{KEYWORD_FMT(word)}'.lower()
+
+
+def fmt_pad(pad: str) -> str:
+    return PAD_FMT(pad)
+
+
+def fmt_package(name: str) -> str:
+    return PACKAGE_FMT(name)
+
+
+def fmt_class(name: str) -> str:
+    return f'{CLASS_NAME_FMT(name)}.{FAINT_FMT("class")}'
@@ -1,14 +1,47 @@
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from enum import Enum
+from itertools import repeat
 from typing import TypeAlias
-from typing_extensions import Dict, List, Optional, Set, Self, Iterable, Callable
+from typing_extensions import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Self,
+    Iterable,
+    Iterator,
+    Sequence,
+    Tuple,
+)
 from lief import DEX
+from dextree import profiling
 from dextree.treeformat import fmt_type, fmt_string
-from dextree.dex_ints import parse_instructions, INSTRUCTIONS
+from dextree.classcache import ClassCache
+from dextree.dex_ints import parse_const_strings, scan_const_strings
+from dextree.pools import DexPools
+from dextree.sources import read_source
+from dextree.dexfile import (
+    NO_INDEX,
+    DexHeader,
+    DexClass,
+    DexFile,
+    DexMethod,
+    access_flags,
+    flags_mask,
+)
 
 JustName: TypeAlias = str
+ClassFilter: TypeAlias = Callable[[str, JustName], bool]
 
 
-@dataclass
+class Engine(str, Enum):
+    python = 'python'
+    numpy = 'numpy'
+
+
+@dataclass(slots=True)
 class TreeString(object):
     value: str
 
@@ -16,7 +49,7 @@ class TreeString(object):
         return f'{self.value}'
 
 
-@dataclass
+@dataclass(slots=True)
 class TreeField(object):
     name: str
     type: str
@@ -28,17 +61,21 @@ class TreeField(object):
         return TreeField(name, type, is_static, None)
 
 
-@dataclass
+@dataclass(slots=True)
 class TreeMethod(object):
     name: str
-    parameter_types: List[str]
+    parameter_types: Tuple[str, ...]
     return_type: str
-    access_flags: Iterable[DEX.ACCESS_FLAGS]
+    access_mask: int
     string_values: List[TreeString]
 
+    @property
+    def access_flags(self) -> List[DEX.ACCESS_FLAGS]:
+        return access_flags(self.access_mask)
+
     @property
     def is_static(self):
-        return DEX.ACCESS_FLAGS.STATIC in self.access_flags
+        return bool(self.access_mask & DEX.ACCESS_FLAGS.STATIC.value)
 
     def __str__(self):
         return f'TreeMethod({self.return_type} {self.name}(#parameters={len(self.parameter_types)}))'
@@ -46,14 +83,14 @@ class TreeMethod(object):
     @staticmethod
     def new(
         name: str,
-        parameter_types: List[str],
+        parameter_types: Tuple[str, ...],
         return_type: str,
-        access_flags: Iterable[DEX.ACCESS_FLAGS],
+        access_mask: int,
     ) -> Self:
-        return TreeMethod(name, parameter_types, return_type, access_flags, [])
+        return TreeMethod(name, parameter_types, return_type, access_mask, [])
 
 
-@dataclass
+@dataclass(slots=True)
 class TreeClass(object):
     path: str
     name: JustName
@@ -68,7 +105,7 @@ class TreeClass(object):
         return TreeClass(path, name, [], [])
 
 
-@dataclass
+@dataclass(slots=True)
 class TreePackage(object):
     path: str
     name: JustName
@@ -82,115 +119,404 @@ class TreePackage(object):
     def new(path: str, name: JustName) -> Self:
         return TreePackage(path, name, {}, {})
 
-    def iterate(self, callback):
-        def iterate_it(item, cb, depth=[]):
-            cb(item, depth)
-            if isinstance(item, TreePackage):
-                for_each(
-                    item.packages.values(),
-                    lambda item, is_last: iterate_it(
-                        item, cb, depth + [not is_last or len(item.classes) > 0]
-                    ),
-                )
-                for_each(
-                    item.classes.values(),
-                    lambda item, is_last: iterate_it(item, cb, depth + [not is_last]),
-                )
-            elif isinstance(item, TreeClass):
-                for_each(
-                    item.fields,
-                    lambda item, is_last: iterate_it(
-                        item, cb, depth + [not is_last or len(item.methods) > 0]
-                    ),
-                )
-                for_each(
-                    item.methods,
-                    lambda item, is_last: iterate_it(item, cb, depth + [not is_last]),
-                )
-            elif isinstance(item, TreeMethod):
-                for_each(
-                    item.string_values,
-                    lambda item, is_last: iterate_it(item, cb, depth + [not is_last]),
-                )
-            elif isinstance(item, TreeField):
-                if item.string_value:
-                    iterate_it(item.string_value, cb, depth + [False])
+    def walk(self) -> 'TreeWalker':
+        return TreeWalker(self)
 
-        iterate_it(self, lambda item, depth: callback(item, depth))
+    def iterate(self, callback):
+        for item, depth in self.walk():
+            callback(item, depth)
 
 
 class RootPackage(TreePackage):
+    __slots__ = ('interned', 'index')
+
     def __init__(self):
         super().__init__('', '', {}, {})
+        self.interned: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        self.index: Dict[str, TreePackage] = {'': self}
+
+    def intern_types(self, types: Iterable) -> Tuple[str, ...]:
+        # one shared tuple of interned descriptors per distinct parameter list
+        if type(types) is not tuple:
+            types = tuple(sys.intern(str(t)) for t in types)
+        return self.interned.setdefault(types, types)
 
     def get(self, package_name: str) -> TreePackage:
-        if len(package_name) == 0:
-            return self
-        parts = package_name.split('/')
-        parent = self
-        for i in range(len(parts)):
-            parent = parent.packages[parts[i]]
-            if not parent:
-                break
-        return parent
-
-
-def for_each[T](items: Iterable[T], fn: Callable[[T, bool], None]):
+        return self.index[package_name]
+
+    def package(self, package_name: str) -> TreePackage:
+        item = self.index.get(package_name)
+        if item is None:
+            # parents are created first, at most once per package
+            path, _, name = package_name.rpartition('/')
+            parent = self.package(path)
+            item = parent.packages[name] = TreePackage.new(path, name)
+            self.index[package_name] = item
+        return item
+
+
+def for_each[T](items: Sequence[T], trailing: bool) -> Iterator[Tuple[T, bool]]:
     length = len(items)
     for i, item in enumerate(items):
-        fn(item, i == length - 1)
+        yield item, i < length - 1 or trailing
+
+
+def tree_children(item) -> Iterator[Tuple[object, bool]]:
+    # each child comes with whether its branch line continues below it
+    if isinstance(item, TreePackage):
+        yield from for_each(item.packages.values(), len(item.classes) > 0)
+        yield from for_each(item.classes.values(), False)
+    elif isinstance(item, TreeClass):
+        yield from for_each(item.fields, len(item.methods) > 0)
+        yield from for_each(item.methods, False)
+    elif isinstance(item, TreeMethod):
+        yield from for_each(item.string_values, False)
+    elif isinstance(item, TreeField):
+        if item.string_value:
+            yield item.string_value, False
+
+
+class TreeWalker(object):
+    def __init__(self, root):
+        self.root = root
+        self.depth: List[bool] = []
+        self.pruned = False
+        self.stopped = False
+
+    def prune(self):
+        self.pruned = True
+
+    def stop(self):
+        self.stopped = True
+
+    def __iter__(self) -> Iterator[Tuple[object, List[bool]]]:
+        # depth is shared and updated in place, copy it to keep it around
+        depth = self.depth
+        stack: List[Iterator[Tuple[object, bool]]] = []
+        item = self.root
+
+        while True:
+            yield item, depth
+            if self.stopped:
+                return
+            if self.pruned:
+                self.pruned = False
+            else:
+                stack.append(tree_children(item))
+                depth.append(False)
+
+            while stack:
+                child = next(stack[-1], None)
+                if child is not None:
+                    item, depth[-1] = child
+                    break
+                stack.pop()
+                depth.pop()
+            else:
+                return
+
+
+def decode_classes(
+    source: str,
+    start: int,
+    stop: int,
+    select: Optional[ClassFilter] = None,
+    count=False,
+) -> Tuple[Dict[int, List[str]], Optional[List[int]]]:
+    dex = DexFile(read_source(source), name=source)
+    pools = DexPools(dex)
+    # the profiler lives in the parent, opcodes counted here are sent back
+    counter = profiling.Profiler() if count else None
+    decoded = {}
+    for clazz in dex.classes[start:stop]:
+        if select is not None and not select(clazz.package_name, clazz.name):
+            continue
+        for method in clazz.methods:
+            if method.code_size:
+                decoded[method.index] = parse_const_strings(method, pools)
+                if counter is not None:
+                    counter.count_opcodes(pools.code(method))
+    return decoded, counter and counter.opcodes
+
+
+def decode_parallel(
+    pools: DexPools, source: str, jobs: int, select: Optional[ClassFilter] = None
+) -> Dict[int, List[str]]:
+    # the count comes from the header already loaded, not from another read
+    count = DexHeader.parse(pools.data).class_defs_size
+    # one chunk per worker, each of them reads and parses the dex once
+    step = max(1, -(-count // jobs))
+    starts = range(0, count, step)
+
+    decoded = {}
+    profiler = profiling.active
+    with ProcessPoolExecutor(max(1, min(jobs, len(starts)))) as pool:
+        stops = [start + step for start in starts]
+        chunks = pool.map(
+            decode_classes,
+            repeat(source),
+            starts,
+            stops,
+            repeat(select),
+            repeat(profiler is not None),
+        )
+        for chunk, opcodes in chunks:
+            decoded.update(chunk)
+            if opcodes is not None:
+                profiler.add_opcodes(opcodes)
+    return decoded
+
+
+class ClassDecoder(object):
+    def __init__(
+        self,
+        pools: DexPools,
+        code=False,
+        fields=False,
+        intern_types: Callable[[Iterable], Tuple[str, ...]] = tuple,
+        decoded: Optional[Dict[int, List[str]]] = None,
+        classes: Optional[ClassCache] = None,
+    ):
+        # lazy nodes decode through this later, its pools keep the dex alive
+        self.pools = pools
+        self.code = code
+        self.with_fields = fields
+        self.intern_types = intern_types
+        self.decoded = decoded
+        self.classes = classes
+
+    def fields(self, clazz: DEX.Class | DexClass) -> List[TreeField]:
+        if not self.with_fields:
+            return []
+        items = []
+        for field in clazz.fields:
+            type = sys.intern(str(field.type))
+            items.append(TreeField.new(field.name, type, field.is_static))
+        return items
+
+    def methods(self, clazz: DEX.Class | DexClass, lazy=False) -> List[TreeMethod]:
+        items = []
+        methods = clazz.methods
+        profiling.count('methods', len(methods))
+        cached = None
+        if self.classes is not None and self.code and self.decoded is None and not lazy:
+            cached = self.cached_strings(methods)
+        for i, method in enumerate(methods):
+            proto = method.prototype
+            parameter_types = self.intern_types(map(str, proto.parameters_type))
+            return_type = sys.intern(str(proto.return_type))
+            flags = flags_mask(method)
+            if lazy and self.code:
+                item = LazyTreeMethod.new(
+                    method.name, parameter_types, return_type, flags, method, self
+                )
+            else:
+                item = TreeMethod.new(method.name, parameter_types, return_type, flags)
+                if cached is not None:
+                    item.string_values.extend(cached[i])
+                else:
+                    item.string_values.extend(self.strings(method))
+            items.append(item)
+        return items
+
+    def strings(self, method: DEX.Method | DexMethod) -> List[TreeString]:
+        if self.decoded is not None:
+            texts = self.decoded.get(method.index, ())
+        elif self.code:
+            with profiling.phase('decode'):
+                texts = parse_const_strings(method, self.pools)
+            if profiling.active is not None:
+                with profiling.phase('count'):
+                    profiling.active.count_opcodes(self.pools.code(method))
+        else:
+            return []
+        profiling.count('strings', len(texts))
+        return [TreeString(text) for text in texts]
+
+    def cached_strings(
+        self, methods: Sequence[DEX.Method | DexMethod]
+    ) -> List[List[TreeString]]:
+        # unchanged code holds the same string ids, they are looked up in this dex
+        pools = self.pools
+        buffers = [pools.code(method) for method in methods]
+        if profiling.active is not None:
+            with profiling.phase('count'):
+                for buffer in buffers:
+                    profiling.active.count_opcodes(buffer)
+        key = self.classes.key(buffers)
+        with profiling.phase('cache'):
+            found = self.classes.get(key)
+        if found is None or len(found) != len(buffers):
+            with profiling.phase('decode'):
+                found = [scan_const_strings(buffer) for buffer in buffers]
+            self.classes.put(key, found)
+        else:
+            profiling.count('cached classes')
+
+        strings = pools.strings
+        profiling.count('strings', sum(map(len, found)))
+        return [list(map(TreeString, strings.take(ids))) for ids in found]
+
+
+class LazyTreeClass(TreeClass):
+    __slots__ = ('clazz', 'decoder')
 
+    @staticmethod
+    def new(
+        path: str, name: JustName, clazz: DEX.Class | DexClass, decoder: ClassDecoder
+    ) -> Self:
+        item = LazyTreeClass(path, name, None, None)
+        item.clazz = clazz
+        item.decoder = decoder
+        return item
 
-def gen_packages_sorted(dex: DEX.File) -> List[str]:
-    gen: Set[tuple] = set()
-    for clazz in dex.classes:
-        parts = clazz.package_name.split('/')
-        while len(parts) > 0:
-            gen.add(tuple(parts))
-            parts.pop()
-    return sorted(gen, key=len)
+    @property
+    def fields(self) -> List[TreeField]:
+        fields = CLASS_FIELDS.__get__(self)
+        if fields is None:
+            fields = self.decoder.fields(self.clazz)
+            CLASS_FIELDS.__set__(self, fields)
+        return fields
 
+    @fields.setter
+    def fields(self, fields: List[TreeField]):
+        CLASS_FIELDS.__set__(self, fields)
 
-def treeify(dex: DEX.File, code=False, fields=False) -> RootPackage:
-    root = RootPackage()
+    @property
+    def methods(self) -> List[TreeMethod]:
+        methods = CLASS_METHODS.__get__(self)
+        if methods is None:
+            methods = self.decoder.methods(self.clazz, lazy=True)
+            CLASS_METHODS.__set__(self, methods)
+        return methods
 
-    # make packages
-    gens = gen_packages_sorted(dex)
-    for gen in gens:
-        path = '/'.join(gen[:-1])
-        name = gen[-1]
-        parent = root.get(path)
-        parent.packages[name] = TreePackage.new(path, name)
+    @methods.setter
+    def methods(self, methods: List[TreeMethod]):
+        CLASS_METHODS.__set__(self, methods)
 
-    # iterate all classes
-    for clazz in dex.classes:
-        parent = root.get(clazz.package_name)
-        path = clazz.package_name
-        name = clazz.name
-        parent.classes[name] = TreeClass.new(path, name)
-        parent = parent.classes[name]
 
-        # iterate all fields in class
-        if fields:
-            for field in clazz.fields:
-                item = TreeField.new(field.name, field.type, field.is_static)
-                parent.fields.append(item)
+class LazyTreeMethod(TreeMethod):
+    __slots__ = ('method', 'decoder')
 
-        # iterate all methods in class
-        for method in clazz.methods:
-            proto = method.prototype
-            parameter_types = proto.parameters_type
-            return_type = proto.return_type
-            flags = method.access_flags
-            item = TreeMethod.new(method.name, parameter_types, return_type, flags)
-            parent.methods.append(item)
-
-            if code:
-                parsed = parse_instructions(method, dex)
-                for insn, parse in parsed:
-                    # text = f"{insn.label} {', '.join(parse)}"
-                    if insn.label.startswith('const-string'):
-                        text = parse[-1]
-                        item.string_values.append(TreeString(text))
+    @staticmethod
+    def new(
+        name: str,
+        parameter_types: Tuple[str, ...],
+        return_type: str,
+        access_mask: int,
+        method: DEX.Method | DexMethod,
+        decoder: ClassDecoder,
+    ) -> Self:
+        item = LazyTreeMethod(name, parameter_types, return_type, access_mask, None)
+        item.method = method
+        item.decoder = decoder
+        return item
+
+    @property
+    def string_values(self) -> List[TreeString]:
+        values = METHOD_STRINGS.__get__(self)
+        if values is None:
+            values = self.decoder.strings(self.method)
+            METHOD_STRINGS.__set__(self, values)
+        return values
+
+    @string_values.setter
+    def string_values(self, values: List[TreeString]):
+        METHOD_STRINGS.__set__(self, values)
+
+
+# slot storage of the eager nodes, the lazy ones fill it on first access
+CLASS_FIELDS = TreeClass.__dict__['fields']
+CLASS_METHODS = TreeClass.__dict__['methods']
+METHOD_STRINGS = TreeMethod.__dict__['string_values']
+
+
+def listed_classes(dex: DEX.File | DexFile) -> List[DEX.Class | DexClass]:
+    # referenced classes go last by descriptor, both backends list the same tree
+    classes = list(dex.classes)
+    defined = [clazz for clazz in classes if clazz.index != NO_INDEX]
+    referenced = [clazz for clazz in classes if clazz.index == NO_INDEX]
+    referenced.sort(key=lambda clazz: clazz.fullname)
+    return defined + referenced
+
+
+def tree_classes(
+    dex: DEX.File | DexFile | DexPools,
+    code=False,
+    fields=False,
+    jobs=1,
+    source: Optional[str] = None,
+    intern_types: Callable[[Iterable], Tuple[str, ...]] = tuple,
+    select: Optional[ClassFilter] = None,
+    lazy=False,
+    engine: Engine = Engine.python,
+    classes: Optional[ClassCache] = None,
+) -> Iterator[Tuple[DEX.Class | DexClass, TreeClass]]:
+    # decode method bytecode in worker processes, each maps the file itself
+    # callers that loaded the dex pass its pools, code is sliced from them
+    pools = dex if isinstance(dex, DexPools) else DexPools(dex)
+    dex = pools.dex
+    decoded = None
+    source = source or dex.location
+    if code and jobs > 1 and source and not lazy:
+        with profiling.phase('decode'):
+            decoded = decode_parallel(pools, source, jobs, select)
+    elif code and engine == Engine.numpy and not lazy:
+        # optional dependency, only needed for this engine
+        from dextree.vectorized import decode_const_strings
+
+        with profiling.phase('decode'):
+            decoded = decode_const_strings(pools, select)
+    decoder = ClassDecoder(pools, code, fields, intern_types, decoded, classes)
+
+    # one class at a time, nothing is kept once the caller moved on
+    for clazz in listed_classes(dex):
+        path = clazz.package_name
+        name = clazz.name
+        if select is not None and not select(path, name):
+            # filtered out classes are never decoded
+            continue
+        profiling.count('classes')
+        if lazy:
+            # members are decoded the first time they are read
+            yield clazz, LazyTreeClass.new(path, name, clazz, decoder)
+        else:
+            item = TreeClass(path, name, decoder.fields(clazz), decoder.methods(clazz))
+            yield clazz, item
+
+
+def treeify(
+    dex: DEX.File | DexFile | DexPools,
+    code=False,
+    fields=False,
+    jobs=1,
+    source: Optional[str] = None,
+    root: Optional[RootPackage] = None,
+    select: Optional[ClassFilter] = None,
+    lazy=False,
+    engine: Engine = Engine.python,
+    classes: Optional[ClassCache] = None,
+) -> RootPackage:
+    root = root or RootPackage()
+
+    # iterate all classes, packages are made as they are first seen
+    items = tree_classes(
+        dex,
+        code,
+        fields,
+        jobs,
+        source,
+        root.intern_types,
+        select,
+        lazy,
+        engine,
+        classes,
+    )
+    for clazz, item in items:
+        parent = root.package(item.path)
+        if item.name in parent.classes and clazz.index == NO_INDEX:
+            # only referenced here, already listed from another dex
+            continue
+        parent.classes[item.name] = item
 
     return root
@@ -0,0 +1,124 @@
+import numpy as np
+from typing_extensions import Callable, Dict, List, Optional, Sequence, Tuple
+from lief import DEX
+from dextree import profiling
+from dextree.dex_ints import INSTRUCTION_SIZES, INSTRUCTIONS, Decoded, Instruction
+from dextree.dexfile import DexMethod
+from dextree.pools import DexPools
+
+UNIT_SIZES = np.frombuffer(INSTRUCTION_SIZES, np.uint8).astype(np.int32) // 2
+
+
+def join_code(buffers: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    # all methods as one array of code units, bounds[i] is where method i starts
+    bounds = np.zeros(len(buffers) + 1, np.int32)
+    np.cumsum([len(buffer) // 2 for buffer in buffers], out=bounds[1:])
+    units = np.frombuffer(b''.join(buffers), '<u2').astype(np.int32)
+    return units, bounds
+
+
+def instruction_lengths(units: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    lengths = UNIT_SIZES.take(units & 0xFF)
+
+    # nop with a payload type in the high byte covers the whole payload
+    payloads = np.flatnonzero((units & 0xFCFF == 0) & (units != 0))
+    kind = units[payloads] >> 8
+    first = units.take(payloads + 1, mode='clip').astype(np.int64)
+    size = (
+        units.take(payloads + 2, mode='clip')
+        | units.take(payloads + 3, mode='clip') << 16
+    )
+    lengths[payloads] = np.select(
+        [kind == 1, kind == 2],
+        [first * 2 + 4, first * 4 + 2],
+        4 + (size * first + 1) // 2,
+    ).clip(max=len(units))
+    return lengths, payloads
+
+
+def instruction_starts(units: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    count = len(units)
+    lengths, payloads = instruction_lengths(units)
+    # a jump past the end of a method stops at the shared end slot
+    ends = np.repeat(bounds[1:], np.diff(bounds))
+    jumps = np.empty(count + 1, np.int32)
+    np.add(np.arange(count, dtype=np.int32), lengths, out=jumps[:count])
+    jumps[:count][jumps[:count] >= ends] = count
+    jumps[count] = count
+
+    # every unit reachable from a method start by jumps of 1, 2, 4, ... instructions
+    reached = np.zeros(count + 1, bool)
+    reached[bounds[:-1]] = True
+    longest = int(np.diff(bounds).max(initial=0))
+    steps = 1
+    while steps < longest:
+        reached[jumps.take(np.flatnonzero(reached))] = True
+        jumps = jumps.take(jumps)
+        steps *= 2
+
+    # payloads are skipped over, they are not instructions
+    reached[payloads] = False
+    return np.flatnonzero(reached[:count])
+
+
+def scan_const_strings(buffers: Sequence) -> List[List[int]]:
+    units, bounds = join_code(buffers)
+    starts = instruction_starts(units, bounds)
+    ops = units[starts] & 0xFF
+    if profiling.active is not None:
+        counts = np.bincount(ops, minlength=256)
+        profiling.active.opcodes = (counts + profiling.active.opcodes).tolist()
+
+    # string indices of const-string and const-string/jumbo in code order
+    jumbo = ops == 0x1B
+    strings = (ops == 0x1A) | jumbo
+    starts, jumbo = starts[strings], jumbo[strings]
+    method = np.searchsorted(bounds, starts, 'right') - 1
+    padded = np.concatenate([units, np.zeros(2, np.int32)]).astype(np.int64)
+    indices = padded[starts + 1] | np.where(jumbo, padded[starts + 2] << 16, 0)
+
+    # operands cut off by the end of their method are left out
+    whole = starts + 1 + jumbo < bounds[method + 1]
+    indices, method = indices[whole].tolist(), method[whole]
+    offsets = np.searchsorted(method, np.arange(len(bounds)), 'left').tolist()
+    return [indices[offsets[i] : offsets[i + 1]] for i in range(len(bounds) - 1)]
+
+
+def decode_const_strings(
+    pools: DexPools, select: Optional[Callable[[str, str], bool]] = None
+) -> Dict[int, List[str]]:
+    methods = []
+    for clazz in pools.dex.classes:
+        if select is not None and not select(clazz.package_name, clazz.name):
+            continue
+        methods += [m for m in clazz.methods if m.code_offset]
+
+    found = scan_const_strings([pools.code(m) for m in methods])
+    strings = pools.strings
+    return {
+        m.index: [strings[i] for i in indices] for m, indices in zip(methods, found)
+    }
+
+
+def iter_instructions(buffer) -> List[Tuple[int, Instruction]]:
+    units, bounds = join_code([buffer])
+    starts = instruction_starts(units, bounds)
+    ops = (units[starts] & 0xFF).tolist()
+    return [(2 * start, INSTRUCTIONS[op]) for start, op in zip(starts.tolist(), ops)]
+
+
+def decode_instructions(buffer) -> List[Decoded]:
+    return [
+        inst.template.decode(buffer, start) for start, inst in iter_instructions(buffer)
+    ]
+
+
+def parse_instructions(
+    method: DEX.Method | DexMethod, pools: DexPools
+) -> List[Tuple[Instruction, Tuple]]:
+    buffer = pools.code(method)
+    offset = method.code_offset
+    return [
+        (inst, inst.template.parse(buffer, start, pools, offset))
+        for start, inst in iter_instructions(buffer)
+    ]
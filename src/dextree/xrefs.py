@@ -0,0 +1,194 @@
+import marshal
+import sqlite3
+from array import array
+from dataclasses import dataclass
+from itertools import accumulate, repeat
+from typing_extensions import Callable, List, Optional, Self
+from lief import DEX
+from dextree import profiling
+from dextree.dex_ints import scan_refs
+from dextree.dexfile import DexField, DexMethod
+from dextree.pools import DexPools
+from dextree.treeformat import CLASS_NAME_FMT, fmt_field, fmt_function, fmt_type
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS xrefs (
+    source TEXT NOT NULL,
+    options TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    arrays BLOB NOT NULL,
+    PRIMARY KEY (source, options)
+) WITHOUT ROWID;
+"""
+
+
+class Adjacency(object):
+    # compressed rows, the targets of id i are targets[offsets[i] : offsets[i + 1]]
+    def __init__(self, offsets: array, targets: array):
+        self.offsets = offsets
+        self.targets = targets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, id: int) -> array:
+        return self.targets[self.offsets[id] : self.offsets[id + 1]]
+
+    @property
+    def edges(self) -> int:
+        return len(self.targets)
+
+    def sources(self) -> array:
+        offsets = self.offsets
+        sources = array('I')
+        for id in range(len(self)):
+            sources.extend(repeat(id, offsets[id + 1] - offsets[id]))
+        return sources
+
+    def transpose(self, size: int) -> 'Adjacency':
+        # sources come in id order, so every reversed row stays sorted
+        return Adjacency.build(size, self.targets, self.sources())
+
+    @staticmethod
+    def build(size: int, sources: array, targets: array) -> 'Adjacency':
+        counts = [0] * (size + 1)
+        for source in sources:
+            counts[source + 1] += 1
+        offsets = array('I', accumulate(counts))
+
+        # counting sort, edges keep their order within a row
+        fill = offsets.tolist()
+        out = array('I', bytes(4 * len(targets)))
+        for source, target in zip(sources, targets):
+            out[fill[source]] = target
+            fill[source] += 1
+        return Adjacency(offsets, out)
+
+
+@dataclass
+class XrefIndex(object):
+    calls: Adjacency
+    callers: Adjacency
+    reads: Adjacency
+    readers: Adjacency
+    writes: Adjacency
+    writers: Adjacency
+
+    @staticmethod
+    def new(
+        pools: DexPools, select: Optional[Callable[[str, str], bool]] = None
+    ) -> Self:
+        methods = len(pools.methods)
+        fields = len(pools.fields)
+        edges = [(array('I'), array('I')) for _ in range(3)]
+        seen = bytearray(methods)
+
+        for clazz in pools.dex.classes:
+            if select is not None and not select(clazz.package_name, clazz.name):
+                continue
+            for method in clazz.methods:
+                index = method.index
+                if not method.code_offset or seen[index]:
+                    continue
+                seen[index] = 1
+                with profiling.phase('decode'):
+                    refs = scan_refs(pools.code(method))
+                for (sources, targets), ids in zip(edges, refs):
+                    ids = sorted(set(ids))
+                    sources.extend(repeat(index, len(ids)))
+                    targets.extend(ids)
+
+        calls, reads, writes = (
+            Adjacency.build(methods, sources, targets) for sources, targets in edges
+        )
+        return XrefIndex(
+            calls,
+            calls.transpose(methods),
+            reads,
+            reads.transpose(fields),
+            writes,
+            writes.transpose(fields),
+        )
+
+    def dumps(self) -> bytes:
+        # offsets and targets of every adjacency, in field order
+        adjacencies = (
+            self.calls,
+            self.callers,
+            self.reads,
+            self.readers,
+            self.writes,
+            self.writers,
+        )
+        return marshal.dumps(
+            [(item.offsets.tobytes(), item.targets.tobytes()) for item in adjacencies]
+        )
+
+    @staticmethod
+    def loads(data: bytes) -> Self:
+        adjacencies = [
+            Adjacency(array('I', offsets), array('I', targets))
+            for offsets, targets in marshal.loads(data)
+        ]
+        return XrefIndex(*adjacencies)
+
+
+class XrefStore(object):
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    @staticmethod
+    def open(path: str) -> Self:
+        connection = sqlite3.connect(path)
+        connection.executescript(SCHEMA)
+        return XrefStore(connection)
+
+    def close(self):
+        self.connection.close()
+
+    def load(self, source: str, options: str, signature: bytes) -> Optional[XrefIndex]:
+        row = self.connection.execute(
+            'SELECT signature, arrays FROM xrefs WHERE source = ? AND options = ?',
+            (source, options),
+        ).fetchone()
+        # a rebuilt dex has another signature, its index is built again
+        if row is None or row[0] != signature:
+            return None
+        try:
+            return XrefIndex.loads(row[1])
+        except (ValueError, EOFError, TypeError):
+            return None
+
+    def store(self, source: str, options: str, signature: bytes, index: XrefIndex):
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO xrefs (source, options, signature, arrays) '
+                'VALUES (?, ?, ?, ?)',
+                (source, options, signature, index.dumps()),
+            )
+
+
+def class_name(cls: DEX.Class | str) -> str:
+    descriptor = cls if isinstance(cls, str) else cls.fullname
+    return descriptor[1:-1].replace('/', '.')
+
+
+def method_name(method: DEX.Method | DexMethod) -> str:
+    return f'{class_name(method.cls)}.{method.name}'
+
+
+def field_name(field: DEX.Field | DexField) -> str:
+    return f'{class_name(field.cls)}.{field.name}'
+
+
+def fmt_xref_method(method: DEX.Method | DexMethod) -> str:
+    params = ', '.join(map(fmt_type, method.prototype.parameters_type))
+    return f'{CLASS_NAME_FMT(class_name(method.cls))}.{fmt_function(method.name)}({params})'
+
+
+def fmt_xref_field(field: DEX.Field | DexField) -> str:
+    return f'{CLASS_NAME_FMT(class_name(field.cls))}.{fmt_field(field.name)}'
+
+
+def find_members(items, name: Callable[[object], str], text: str) -> List[int]:
+    return [id for id, item in enumerate(items) if text in name(item)]
@@ -0,0 +1,72 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'benchmarks'))
+
+from synthdex import generate
+
+
+@pytest.fixture(scope='module')
+def dex(tmp_path_factory) -> str:
+    path = tmp_path_factory.mktemp('dex') / 'synth.dex'
+    path.write_bytes(generate(classes=30, methods=4, instructions=30, strings=200))
+    return str(path)
+
+
+def dump(*args: str) -> str:
+    # the command line as installed, colors off so runs compare byte for byte
+    result = subprocess.run(
+        [sys.executable, '-m', 'dextree.main', '--color', 'never', *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout
+
+
+@pytest.fixture(scope='module')
+def expected(dex: str) -> str:
+    return dump('--backend', 'native', dex)
+
+
+def test_expected_has_classes(expected: str):
+    assert 'C29.class' in expected
+
+
+@pytest.mark.parametrize(
+    'args',
+    [
+        ['--backend', 'lief'],
+        ['--backend', 'native', '-j', '2'],
+        ['--backend', 'lief', '-j', '2'],
+    ],
+)
+def test_same_output(dex: str, expected: str, args):
+    assert dump(*args, dex) == expected
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec('numpy') is None, reason='numpy is not installed'
+)
+@pytest.mark.parametrize('backend', ['native', 'lief'])
+def test_numpy_engine(dex: str, expected: str, backend: str):
+    assert dump('--backend', backend, '--engine', 'numpy', dex) == expected
+
+
+@pytest.mark.parametrize('backend', ['native', 'lief'])
+def test_caches(dex: str, expected: str, backend: str, tmp_path):
+    cache = str(tmp_path)
+    args = ['--backend', backend, '--cache', cache, dex]
+    # stored by the first run, loaded from the tree cache by the second
+    assert dump(*args) == expected
+    assert dump(*args) == expected
+
+    # without the stored tree every class is answered by the class cache
+    for name in os.listdir(cache):
+        if name.endswith('.tree'):
+            os.remove(os.path.join(cache, name))
+    assert dump(*args) == expected